@@ -1,42 +1,183 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.dependencies import get_current_admin_user
-from app.monitoring import RateLimitMonitor
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from prisma import Prisma
+
+from app.config import settings
+from app.controllers.user import user_controller
+from app.core import query_tracking
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import response_cache
+from app.core.security import claims_cache
+from app.dependencies import get_current_admin_user, get_db
+from app.ip_access import ip_access_lists
+from app.monitoring import rate_limit_monitor
+from app.rate_limiting import rate_limit_policy, rate_limiter
 from app.redis_client import redis_manager
+from app.schemas.rate_limit import RateLimitBulkReset, RateLimitResetResponse
+from app.utils.export import csv_stream, ndjson_stream
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
+USER_EXPORT_FIELDS = ("id", "email", "name", "is_active", "created_at", "updated_at")
+
+def stream_users_export(db: Prisma, export_format: str, updated_since: Optional[datetime] = None):
+    """Stream all users (optionally only those updated since a time) in keyset batches"""
+    where = {"updated_at": {"gte": updated_since}} if updated_since else None
+    batches = user_controller.iter_batches(db, where=where)
+    if export_format == "csv":
+        return csv_stream(batches, USER_EXPORT_FIELDS)
+    return ndjson_stream(batches, USER_EXPORT_FIELDS)
+
 @admin_router.get("/rate-limits/stats")
 async def get_rate_limit_stats(
+    window: int = Query(3600, ge=1, le=settings.RATE_LIMIT_STATS_RETENTION_SECONDS),
+    top: int = Query(10, ge=1, le=100),
     current_admin = Depends(get_current_admin_user)
 ):
-    """Get rate limiting statistics (admin only)"""
-    monitor = RateLimitMonitor(redis_manager)
-    stats = await monitor.get_rate_limit_stats()
+    """Get rate limiting statistics for the last ``window`` seconds (admin only)"""
+    stats = await rate_limit_monitor.get_rate_limit_stats(time_window=window, top=top)
     return stats
 
-@admin_router.delete("/rate-limits/reset/{user_key}")
+@admin_router.post("/rate-limits/policy/reload")
+async def reload_rate_limit_policy(
+    current_admin = Depends(get_current_admin_user)
+):
+    """Recompile the rate limit policy from current settings (admin only)"""
+    policy = rate_limit_policy.reload()
+    return {
+        "enabled": policy.enabled,
+        "routes": len(policy.routes),
+        "whitelist": list(policy.whitelist),
+    }
+
+@admin_router.get("/auth-cache/stats")
+async def get_auth_cache_stats(
+    current_admin = Depends(get_current_admin_user)
+):
+    """Get principal, token claims and response cache statistics (admin only)"""
+    return {
+        "principals": principal_cache.stats(),
+        "claims": claims_cache.stats(),
+        "responses": response_cache.stats(),
+    }
+
+@admin_router.get("/redis/stats")
+async def get_redis_stats(
+    current_admin = Depends(get_current_admin_user)
+):
+    """Get Redis pool usage and the rate limiter's circuit breaker state (admin only)"""
+    return {
+        "pool": redis_manager.pool_stats(),
+        "rate_limit_breaker": rate_limiter.backend.breaker.stats(),
+    }
+
+@admin_router.get("/db/slow-queries")
+async def get_slow_queries(
+    current_admin = Depends(get_current_admin_user)
+):
+    """Get recent slow query samples, newest first (admin only)"""
+    return list(reversed(query_tracking.slow_queries))
+
+@admin_router.get("/users/export")
+async def export_users(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    updated_since: Optional[datetime] = None,
+    db: Prisma = Depends(get_db),
+    current_admin = Depends(get_current_admin_user)
+):
+    """Stream the users table as NDJSON or CSV with constant memory (admin only)"""
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"users.{'csv' if export_format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        stream_users_export(db, export_format, updated_since),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@admin_router.delete("/rate-limits/reset/{user_key}", response_model=RateLimitResetResponse)
 async def reset_user_rate_limit(
     user_key: str,
     current_admin = Depends(get_current_admin_user)
 ):
-    """Reset rate limit for specific user (admin only)"""
-    redis_client = redis_manager.get_sync_client()
-    # Find and delete all keys for this user
-    pattern = f"*{user_key}*"
-    keys = redis_client.keys(pattern)
-    
-    if keys:
-        redis_client.delete(*keys)
-        return {"message": f"Reset rate limits for {user_key}", "keys_deleted": len(keys)}
+    """Reset rate limit for specific user, e.g. "user:42" or "ip:203.0.113.7" (admin only)"""
+    # All of a principal's counters share one key: a single delete
+    deleted = await rate_limiter.reset([user_key])
+    if deleted:
+        message = f"Reset rate limits for {user_key}"
     else:
-        return {"message": f"No rate limit data found for {user_key}"}
+        message = f"No rate limit data found for {user_key}"
+    return RateLimitResetResponse(message=message, requested=1, keys_deleted=deleted)
+
+@admin_router.post("/rate-limits/reset", response_model=RateLimitResetResponse)
+async def reset_rate_limits_bulk(
+    payload: RateLimitBulkReset,
+    current_admin = Depends(get_current_admin_user)
+):
+    """Reset rate limits for many users in pipelined batches (admin only)"""
+    if len(payload.user_keys) > settings.RATE_LIMIT_RESET_MAX_KEYS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.RATE_LIMIT_RESET_MAX_KEYS} keys per request"
+        )
+    
+    deleted = await rate_limiter.reset(payload.user_keys)
+    return RateLimitResetResponse(
+        message=f"Reset rate limits for {len(payload.user_keys)} keys",
+        requested=len(payload.user_keys),
+        keys_deleted=deleted,
+    )
+
+async def change_ip_access_list(list_name: str, ip_address: str, add: bool) -> dict:
+    try:
+        if add:
+            changed = await ip_access_lists.add(list_name, ip_address)
+        else:
+            changed = await ip_access_lists.remove(list_name, ip_address)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid IP address or network: {ip_address}")
+    
+    entry = ip_access_lists.normalize(ip_address)
+    action = "Added" if add else "Removed"
+    direction = "to" if add else "from"
+    return {"message": f"{action} {entry} {direction} {list_name} list", "changed": changed}
 
-@admin_router.post("/rate-limits/whitelist/{ip_address}")
+@admin_router.get("/rate-limits/ip-lists")
+async def get_ip_access_lists(
+    current_admin = Depends(get_current_admin_user)
+):
+    """Get the runtime IP allow and deny lists (admin only)"""
+    return ip_access_lists.entries()
+
+@admin_router.post("/rate-limits/whitelist/{ip_address:path}")
 async def add_ip_to_whitelist(
     ip_address: str,
     current_admin = Depends(get_current_admin_user)
 ):
-    """Add IP to rate limit whitelist (admin only)"""
-    # This would typically update a database or config
-    # For now, we'll just return success
-    return {"message": f"Added {ip_address} to whitelist"}
\ No newline at end of file
+    """Add IP or CIDR range to rate limit whitelist (admin only)"""
+    return await change_ip_access_list("allow", ip_address, add=True)
+
+@admin_router.delete("/rate-limits/whitelist/{ip_address:path}")
+async def remove_ip_from_whitelist(
+    ip_address: str,
+    current_admin = Depends(get_current_admin_user)
+):
+    """Remove IP or CIDR range from rate limit whitelist (admin only)"""
+    return await change_ip_access_list("allow", ip_address, add=False)
+
+@admin_router.post("/rate-limits/denylist/{ip_address:path}")
+async def add_ip_to_denylist(
+    ip_address: str,
+    current_admin = Depends(get_current_admin_user)
+):
+    """Block IP or CIDR range from the API (admin only)"""
+    return await change_ip_access_list("deny", ip_address, add=True)
+
+@admin_router.delete("/rate-limits/denylist/{ip_address:path}")
+async def remove_ip_from_denylist(
+    ip_address: str,
+    current_admin = Depends(get_current_admin_user)
+):
+    """Unblock IP or CIDR range (admin only)"""
+    return await change_ip_access_list("deny", ip_address, add=False)
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
 from prisma import Prisma
 
-from app.main import limiter
 from app.core.security import create_access_token
 from app.dependencies import get_db
 from app.controllers.user import user_controller
@@ -11,7 +10,6 @@ from app.schemas.auth import LoginCredentials
 router = APIRouter()
 
 @router.post("/login")
-@limiter.limit("10/hour")  # Very strict for login
 async def login(
     request: Request,
     credentials: LoginCredentials,
@@ -27,7 +25,6 @@ async def login(
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/register")
-@limiter.limit("5/hour")  # Very strict for registration
 async def register(
     request: Request,
     user_data: UserCreate,
@@ -1,33 +1,86 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, Query
 from prisma import Prisma
+from prisma.errors import UniqueViolationError
 from prisma.models import User
 from typing import List, Optional
-from slowapi import Limiter
+from pydantic import TypeAdapter, ValidationError
 
-from app.dependencies import get_current_user, get_current_user_optional, get_db
-from app.schemas.user import UserCreate, UserResponse
+from app.config import settings
+from app.core.response_cache import CachedResponse, response_cache
+from app.dependencies import get_current_admin_user, get_current_user, get_current_user_optional, get_db, get_read_db
+from app.schemas.user import UserBulkCreate, UserBulkResponse, UserBulkResult, UserBulkRow, UserCreate, UserResponse, UserUpdate
 from app.controllers.user import user_controller
-
-# Get limiter from main app
-from app.main import limiter
+from app.utils.etag import etag_matches, page_etag, record_etag
+from app.utils.pagination import clamp_page_size
+from app.utils.serialization import RowSerializer
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserResponse])
-@limiter.limit("100/hour")  # This will be overridden by dynamic rate limiting
+# Serialize straight to JSON bytes once per cache miss
+user_list_adapter = TypeAdapter(List[UserResponse])
+user_serializer = RowSerializer(UserResponse)
+
+def render_user(user: User) -> bytes:
+    if settings.FAST_JSON_RESPONSES:
+        return user_serializer.one(user)
+    return UserResponse.model_validate(user, from_attributes=True).model_dump_json().encode()
+
+def render_users(users: List[User]) -> bytes:
+    if settings.FAST_JSON_RESPONSES:
+        return user_serializer.many(users)
+    return user_list_adapter.dump_json(user_list_adapter.validate_python(users, from_attributes=True))
+
+@router.get(
+    "/",
+    response_model=List[UserResponse]
+)
 async def get_users(
     request: Request,
-    skip: int = 0,
-    limit: int = 100,
-    db: Prisma = Depends(get_db),
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=0),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True),
+    db: Prisma = Depends(get_read_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Get users with rate limiting"""
-    users = await user_controller.get_multi(db, skip=skip, limit=limit)
-    return users
+    """
+    Get users ordered by id, one page at a time.
+    Pass the X-Next-Cursor response header back as ``cursor`` for the next page;
+    ``limit`` is capped at MAX_PAGE_SIZE. ``skip`` is kept for old clients only.
+    Pages are served from the response cache until a user changes; send the
+    ETag back in If-None-Match to get a 304 when the page is unchanged.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    limit = clamp_page_size(limit)
+    if skip is not None:
+        async def load_offset_page() -> CachedResponse:
+            users = await user_controller.get_multi(db, skip=skip, limit=limit)
+            return CachedResponse(render_users(users), {"ETag": page_etag(users)})
+        
+        cached = await response_cache.get_or_load(
+            f"users:skip={skip}:limit={limit}", ["users"], load_offset_page
+        )
+        return cached.to_response(response, if_none_match)
+    
+    async def load_page() -> CachedResponse:
+        try:
+            users, next_cursor = await user_controller.get_page(db, cursor=cursor, limit=limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        headers = {"ETag": page_etag(users)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return CachedResponse(render_users(users), headers)
+    
+    cached = await response_cache.get_or_load(
+        f"users:cursor={cursor or ''}:limit={limit}", ["users"], load_page
+    )
+    return cached.to_response(response, if_none_match)
 
-@router.post("/", response_model=UserResponse)
-@limiter.limit("10/hour")  # Strict limit for user creation
+@router.post(
+    "/",
+    response_model=UserResponse
+)
 async def create_user(
     request: Request,
     user: UserCreate,
@@ -41,16 +94,118 @@ async def create_user(
     new_user = await user_controller.create(db, obj_in=user)
     return new_user
 
-@router.get("/{user_id}", response_model=UserResponse)
-@limiter.limit("500/hour")
+@router.post(
+    "/bulk",
+    response_model=UserBulkResponse
+)
+async def create_users_bulk(
+    request: Request,
+    payload: UserBulkCreate,
+    db: Prisma = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Create (or update) users in bulk with per-row results (admin only)"""
+    if len(payload.users) > settings.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BULK_MAX_ROWS} users per request"
+        )
+    
+    results = {}
+    valid_indexes, valid_users = [], []
+    for index, row in enumerate(payload.users):
+        try:
+            valid_users.append(UserBulkRow.model_validate(row))
+            valid_indexes.append(index)
+        except ValidationError as e:
+            email = row.get("email")
+            results[index] = UserBulkResult(
+                index=index, status="failed", email=email if isinstance(email, str) else None,
+                detail=e.errors(include_url=False)[0]["msg"],
+            )
+    
+    created = await user_controller.create_many(
+        db, objs_in=valid_users, update_existing=payload.update_existing
+    )
+    for index, result in zip(valid_indexes, created):
+        results[index] = result.model_copy(update={"index": index})
+    
+    ordered = [results[index] for index in range(len(payload.users))]
+    return UserBulkResponse(
+        created=sum(r.status == "created" for r in ordered),
+        updated=sum(r.status == "updated" for r in ordered),
+        failed=sum(r.status == "failed" for r in ordered),
+        results=ordered,
+    )
+
+@router.get(
+    "/{user_id}",
+    response_model=UserResponse
+)
 async def get_user(
     user_id: int,
     request: Request,
+    response: Response,
+    db: Prisma = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get specific user (served from the response cache until it changes).
+    Send the ETag back in If-None-Match to get a 304 when it is unchanged.
+    """
+    async def load_user() -> CachedResponse:
+        user = await user_controller.get(db, id=user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return CachedResponse(render_user(user), {"ETag": record_etag(user)})
+    
+    cached = await response_cache.get_or_load(f"user:{user_id}", [f"user:{user_id}"], load_user)
+    return cached.to_response(response, request.headers.get("if-none-match"))
+
+@router.patch(
+    "/{user_id}",
+    response_model=UserResponse
+)
+async def update_user(
+    user_id: int,
+    payload: UserUpdate,
+    request: Request,
+    response: Response,
     db: Prisma = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get specific user"""
+    """
+    Update your own user (admins may update anyone).
+    Send the ETag from GET in If-Match to update only if nobody changed the
+    user in between; otherwise the update fails with 412.
+    """
+    if current_user.id != user_id and getattr(current_user, 'role', 'user') != 'admin':
+        raise HTTPException(status_code=403, detail="Not allowed to update this user")
+    
     user = await user_controller.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    
+    if_match = request.headers.get("if-match")
+    if if_match is not None and not etag_matches(if_match, record_etag(user)):
+        raise HTTPException(status_code=412, detail="User was modified; fetch it again")
+    
+    # Explicit nulls leave a field unchanged; the columns are not nullable
+    update_data = payload.model_dump(exclude_unset=True, exclude_none=True)
+    if update_data.get("email") not in (None, user.email):
+        if await user_controller.get_by_email(db, email=update_data["email"]):
+            raise HTTPException(status_code=400, detail="Email already registered")
+    
+    try:
+        updated = await user_controller.update(
+            db, db_obj=user, obj_in=update_data,
+            expected_updated_at=user.updated_at if if_match is not None else None,
+        )
+    except UniqueViolationError:
+        # Another request took the email after the check above
+        raise HTTPException(status_code=400, detail="Email already registered")
+    if updated is None:
+        raise HTTPException(status_code=412, detail="User was modified; fetch it again")
+    
+    response.headers["ETag"] = record_etag(updated)
+    return updated
\ No newline at end of file
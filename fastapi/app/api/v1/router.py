@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.api.v1.endpoints import users
+from app.api.v1.endpoints import auth, users
+from app.api.v1.endpoints.admin import admin_router
+from app.dependencies import enforce_rate_limit
 
-api_router = APIRouter()
-api_router.include_router(users.router, prefix="/users", tags=["users"])
\ No newline at end of file
+# Every v1 route is rate limited by the compiled user-type policy
+api_router = APIRouter(dependencies=[Depends(enforce_rate_limit)])
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(admin_router)
\ No newline at end of file
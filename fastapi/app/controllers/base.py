@@ -1,7 +1,10 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, AsyncIterator, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
 from prisma import Prisma
 from pydantic import BaseModel
 
+from app.config import settings
+from app.utils.pagination import clamp_page_size, decode_cursor, encode_cursor
+
 ModelType = TypeVar("ModelType")
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -14,12 +17,76 @@ class BaseController(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """Get a single record by ID"""
         raise NotImplementedError
     
+    def get_delegate(self, db: Prisma) -> Any:
+        """Prisma model delegate for this controller (e.g. db.user for User)"""
+        return getattr(db, self.model.__name__.lower())
+    
     async def get_multi(
         self, db: Prisma, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
         """Get multiple records"""
         raise NotImplementedError
     
+    async def get_page(
+        self,
+        db: Prisma,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = settings.DEFAULT_PAGE_SIZE,
+        where: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Get one page of records using keyset pagination on ``id``.
+        Returns the records and the cursor for the next page (None on the
+        last page). Raises ValueError for a malformed cursor.
+        """
+        limit = clamp_page_size(limit)
+        if limit == 0:
+            # No next cursor: echoing ``cursor`` back would loop clients forever
+            return [], None
+        
+        after_id = None
+        if cursor:
+            after_id = decode_cursor(cursor).get("id")
+            if not isinstance(after_id, int):
+                raise ValueError("Invalid cursor")
+        
+        # Fetch one extra row to know whether another page exists
+        records = await self._find_after(db, after_id, limit + 1, where)
+        if len(records) <= limit:
+            return records, None
+        records = records[:limit]
+        return records, encode_cursor({"id": records[-1].id})
+    
+    async def iter_batches(
+        self,
+        db: Prisma,
+        *,
+        batch_size: int = settings.EXPORT_BATCH_SIZE,
+        where: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[List[ModelType]]:
+        """Yield every matching record in id order, ``batch_size`` at a time"""
+        after_id = None
+        while True:
+            records = await self._find_after(db, after_id, batch_size, where)
+            if records:
+                yield records
+            if len(records) < batch_size:
+                return
+            after_id = records[-1].id
+    
+    async def _find_after(
+        self, db: Prisma, after_id: Optional[int], take: int, where: Optional[Dict[str, Any]]
+    ) -> List[ModelType]:
+        filters = [where] if where else []
+        if after_id is not None:
+            filters.append({"id": {"gt": after_id}})
+        return await self.get_delegate(db).find_many(
+            where={"AND": filters} if filters else None,
+            order={"id": "asc"},
+            take=take,
+        )
+    
     async def create(self, db: Prisma, *, obj_in: CreateSchemaType) -> ModelType:
         """Create a new record"""
         raise NotImplementedError
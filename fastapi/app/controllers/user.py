@@ -1,10 +1,16 @@
 from typing import List, Optional, Dict, Any, Union
+from datetime import datetime
+import asyncio
 from prisma import Prisma
+from prisma.errors import UniqueViolationError
 from prisma.models import User
 
+from app.config import settings
 from app.controllers.base import BaseController
-from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.schemas.user import UserBulkResult, UserBulkRow, UserCreate, UserUpdate
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import response_cache
+from app.core.security import hash_password_async, password_hash_pool, verify_password_async
 
 class UserController(BaseController[User, UserCreate, UserUpdate]):
     
@@ -15,11 +21,11 @@ class UserController(BaseController[User, UserCreate, UserUpdate]):
         return await db.user.find_unique(where={"email": email})
     
     async def get_multi(self, db: Prisma, *, skip: int = 0, limit: int = 100) -> List[User]:
-        return await db.user.find_many(skip=skip, take=limit)
+        return await db.user.find_many(skip=skip, take=limit, order={"id": "asc"})
     
     async def create(self, db: Prisma, *, obj_in: UserCreate) -> User:
-        hashed_password = get_password_hash(obj_in.password)
-        return await db.user.create(
+        hashed_password = await hash_password_async(obj_in.password)
+        user = await db.user.create(
             data={
                 "email": obj_in.email,
                 "name": obj_in.name,
@@ -27,14 +33,140 @@ class UserController(BaseController[User, UserCreate, UserUpdate]):
                 "is_active": obj_in.is_active,
             }
         )
+        await response_cache.invalidate("users")
+        return user
+    
+    async def create_many(
+        self,
+        db: Prisma,
+        *,
+        objs_in: List[Union[UserCreate, UserBulkRow]],
+        update_existing: bool = False
+    ) -> List[UserBulkResult]:
+        """
+        Create users in bulk, one result per input row in input order.
+        Each chunk costs one IN lookup, one create_many and one id lookup;
+        existing emails fail unless ``update_existing`` is set, and then
+        only the fields a row sets are written (password and is_active
+        included). If another writer inserts one of the emails meanwhile,
+        the chunk's creates are retried one by one.
+        """
+        results: List[Optional[UserBulkResult]] = [None] * len(objs_in)
+        first_seen: Dict[str, int] = {}
+        for index, obj in enumerate(objs_in):
+            if obj.email in first_seen:
+                results[index] = UserBulkResult(
+                    index=index, status="failed", email=obj.email,
+                    detail="Duplicate email in batch",
+                )
+            else:
+                first_seen[obj.email] = index
+        
+        # Use at most the pool's workers so interactive logins can still queue
+        hash_slots = asyncio.Semaphore(password_hash_pool.max_workers)
+        
+        async def hash_one(password: str) -> str:
+            async with hash_slots:
+                return await hash_password_async(password)
+        
+        indexes = list(first_seen.values())
+        for start in range(0, len(indexes), settings.BULK_CHUNK_SIZE):
+            chunk = indexes[start:start + settings.BULK_CHUNK_SIZE]
+            emails = [objs_in[i].email for i in chunk]
+            existing = {
+                user.email: user
+                for user in await db.user.find_many(where={"email": {"in": emails}})
+            }
+            
+            to_write = []
+            for index in chunk:
+                obj = objs_in[index]
+                if obj.email in existing and not update_existing:
+                    results[index] = UserBulkResult(
+                        index=index, status="failed", email=obj.email,
+                        detail="Email already registered",
+                    )
+                elif obj.email not in existing and obj.password is None:
+                    results[index] = UserBulkResult(
+                        index=index, status="failed", email=obj.email,
+                        detail="Password is required for new users",
+                    )
+                else:
+                    to_write.append(index)
+            
+            creates, updates = [], []
+            for index in to_write:
+                obj = objs_in[index]
+                if obj.email in existing:
+                    # Unset fields keep their stored values (is_active defaults to True)
+                    data = obj.model_dump(exclude_unset=True, exclude_none=True)
+                    updates.append((index, data))
+                else:
+                    data = obj.model_dump(include={"email", "name", "password", "is_active"})
+                    creates.append((index, data))
+            
+            to_hash = [data for _, data in creates + updates if "password" in data]
+            hashes = await asyncio.gather(*(hash_one(data["password"]) for data in to_hash))
+            for data, hashed_password in zip(to_hash, hashes):
+                data["password"] = hashed_password
+            
+            if creates:
+                try:
+                    await db.user.create_many(data=[data for _, data in creates])
+                except UniqueViolationError:
+                    # Another writer took one of these emails after the lookup
+                    for index, data in creates:
+                        try:
+                            user = await db.user.create(data=data)
+                        except UniqueViolationError:
+                            results[index] = UserBulkResult(
+                                index=index, status="failed", email=data["email"],
+                                detail="Email already registered",
+                            )
+                        else:
+                            results[index] = UserBulkResult(
+                                index=index, status="created", email=data["email"], id=user.id,
+                            )
+                else:
+                    created = {
+                        user.email: user.id
+                        for user in await db.user.find_many(
+                            where={"email": {"in": [data["email"] for _, data in creates]}}
+                        )
+                    }
+                    for index, data in creates:
+                        results[index] = UserBulkResult(
+                            index=index, status="created", email=data["email"],
+                            id=created.get(data["email"]),
+                        )
+            
+            if updates:
+                async with db.batch_() as batcher:
+                    for _, data in updates:
+                        batcher.user.update(where={"email": data["email"]}, data=data)
+                for index, data in updates:
+                    user_id = existing[data["email"]].id
+                    await principal_cache.invalidate(user_id)
+                    await response_cache.invalidate(f"user:{user_id}")
+                    results[index] = UserBulkResult(
+                        index=index, status="updated", email=data["email"], id=user_id,
+                    )
+        
+        await response_cache.invalidate("users")
+        return results
     
     async def update(
         self,
         db: Prisma,
         *,
         db_obj: User,
-        obj_in: Union[UserUpdate, Dict[str, Any]]
-    ) -> User:
+        obj_in: Union[UserUpdate, Dict[str, Any]],
+        expected_updated_at: Optional[datetime] = None
+    ) -> Optional[User]:
+        """
+        Update a user. With ``expected_updated_at`` the write only happens if
+        the row still has that updated_at, and None is returned otherwise.
+        """
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
@@ -42,21 +174,38 @@ class UserController(BaseController[User, UserCreate, UserUpdate]):
         
         # Hash password if provided
         if "password" in update_data:
-            update_data["password"] = get_password_hash(update_data["password"])
+            update_data["password"] = await hash_password_async(update_data["password"])
         
-        return await db.user.update(
-            where={"id": db_obj.id},
-            data=update_data
-        )
+        if expected_updated_at is None:
+            user = await db.user.update(
+                where={"id": db_obj.id},
+                data=update_data
+            )
+        else:
+            # Compare-and-set in one statement, so a concurrent write cannot slip in
+            count = await db.user.update_many(
+                where={"id": db_obj.id, "updated_at": expected_updated_at},
+                data=update_data
+            )
+            user = await self.get(db, id=db_obj.id) if count else None
+            if user is None:
+                return None
+        # Cached principals carry is_active/role, so drop them on any change
+        await principal_cache.invalidate(db_obj.id)
+        await response_cache.invalidate(f"user:{db_obj.id}", "users")
+        return user
     
     async def remove(self, db: Prisma, *, id: int) -> Optional[User]:
-        return await db.user.delete(where={"id": id})
+        user = await db.user.delete(where={"id": id})
+        await principal_cache.invalidate(id)
+        await response_cache.invalidate(f"user:{id}", "users")
+        return user
     
     async def authenticate(self, db: Prisma, *, email: str, password: str) -> Optional[User]:
         user = await self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.password):
+        if not await verify_password_async(password, user.password):
             return None
         return user
     
@@ -1,43 +1,89 @@
-from fastapi import FastAPI, Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
 
+from app import metrics
+from app.config import settings
+from app.core import query_tracking
+
 logger = logging.getLogger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request
-        logger.info(f"Request: {request.method} {request.url}")
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Calculate processing time
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        # Log response
-        logger.info(f"Response: {response.status_code} - Time: {process_time:.4f}s")
-        
-        return response
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class RequestTimingMiddleware:
+    """
+    Pure ASGI request logging, timing and error handling in one layer.
+
+    Unlike BaseHTTPMiddleware it does not wrap the app in a task and memory
+    streams, so streaming responses pass straight through. X-Process-Time
+    is the time until the response headers were sent; the latency histogram
+    (labelled by route template) uses the time until the body was sent.
+    Server-Timing reports the request's database query count and time.
+    """
+
+    def __init__(self, app: ASGIApp, record_metrics: bool = settings.METRICS_ENABLED):
+        self.app = app
+        self.record_metrics = record_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        method, path = scope["method"], scope["path"]
+        logger.info("Request: %s %s", method, path)
+
+        status_code = 500
+        process_time = 0.0
+        response_started = False
+        query_token = query_tracking.begin_request(path)
+        if self.record_metrics:
+            metrics.http_requests_in_progress.inc()
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code, process_time, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                process_time = (time.perf_counter_ns() - start) / 1e9
+                queries = query_tracking.current_stats()
+                server_timing = (
+                    f'db;dur={queries.seconds * 1000:.2f};desc="{queries.count} queries", '
+                    f'app;dur={process_time * 1000:.2f}'
+                )
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-process-time", repr(process_time).encode("latin-1")),
+                    (b"server-timing", server_timing.encode("latin-1")),
+                ]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_with_timing)
         except Exception as exc:
-            logger.error(f"Unhandled exception: {exc}")
-            return JSONResponse(
+            logger.error("Unhandled exception: %s %s: %r", method, path, exc, exc_info=True)
+            if response_started:
+                raise
+            response = JSONResponse(
                 status_code=500,
                 content={"detail": "Internal server error"}
             )
+            await response(scope, receive, send_with_timing)
+        finally:
+            queries = query_tracking.end_request(query_token)
+            logger.info("Response: %s - Time: %.4fs", status_code, process_time)
+            if self.record_metrics:
+                metrics.http_requests_in_progress.dec()
+                route = scope.get("route")
+                metrics.observe_request(
+                    method,
+                    route.path if route is not None else metrics.UNMATCHED_ROUTE,
+                    status_code,
+                    (time.perf_counter_ns() - start) / 1e9,
+                    queries.count,
+                )
 
 def setup_middleware(app: FastAPI):
     """Setup custom middleware for the FastAPI application"""
-    app.add_middleware(LoggingMiddleware)
-    app.add_middleware(ErrorHandlingMiddleware)
\ No newline at end of file
+    app.add_middleware(RequestTimingMiddleware)
@@ -0,0 +1,144 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import json
+import logging
+import time
+
+from prisma.models import User
+
+from app.config import settings
+from app.metrics import observe_dependency_call
+from app.redis_client import RedisManager, redis_manager
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class PrincipalCache:
+    """
+    Cache of authenticated users keyed by user id.
+
+    The in-process tier has a short TTL so that workers which did not see an
+    invalidation converge quickly. The optional Redis tier is shared between
+    workers and invalidated explicitly by UserController. Entries never
+    outlive the token that loaded them.
+    """
+
+    KEY_PREFIX = "principal:"
+
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        *,
+        enabled: bool = True,
+        maxsize: int = 10000,
+        local_ttl: float = 10,
+        use_redis: bool = False,
+        redis_ttl: float = 300,
+    ):
+        self.redis_manager = redis_manager
+        self.enabled = enabled
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self._local: TTLCache[int, User] = TTLCache(maxsize, ttl=local_ttl)
+        self.redis_hits = 0
+        self.db_loads = 0
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def _ttl_until(expires_at: Optional[float], ttl: float) -> float:
+        if expires_at is None:
+            return ttl
+        return min(ttl, expires_at - time.time())
+
+    async def _get_shared(self, user_id: int) -> Optional[User]:
+        start = time.perf_counter()
+        try:
+            redis_client = await self.redis_manager.get_async_client()
+            raw = await redis_client.get(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Principal cache read failed: {e}")
+            return None
+        finally:
+            observe_dependency_call("redis", "principal_cache", time.perf_counter() - start)
+        if raw is None:
+            return None
+        # The password hash is never written to Redis
+        return User.model_validate({**json.loads(raw), "password": ""})
+
+    async def _set_shared(self, user: User, ttl: float) -> None:
+        try:
+            redis_client = await self.redis_manager.get_async_client()
+            await redis_client.set(
+                self._key(user.id),
+                user.model_dump_json(exclude={"password"}),
+                px=int(ttl * 1000),
+            )
+        except Exception as e:
+            logger.warning(f"Principal cache write failed: {e}")
+
+    async def get_or_load(
+        self,
+        user_id: int,
+        loader: Callable[[], Awaitable[Optional[User]]],
+        expires_at: Optional[float] = None,
+    ) -> Optional[User]:
+        """Return the cached user or load it, caching until at most ``expires_at``"""
+        if not self.enabled:
+            return await loader()
+
+        user = self._local.get(user_id)
+        if user is not None:
+            return user
+
+        ttl = self._ttl_until(expires_at, self.redis_ttl)
+        if self.use_redis:
+            user = await self._get_shared(user_id)
+            if user is not None:
+                self.redis_hits += 1
+                self._local.set(user_id, user, ttl=ttl)
+                return user
+
+        user = await loader()
+        self.db_loads += 1
+        if user is not None and ttl > 0:
+            self._local.set(user_id, user, ttl=ttl)
+            if self.use_redis:
+                await self._set_shared(user, ttl)
+        return user
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop a user from both tiers after its auth-relevant state changed"""
+        self._local.pop(user_id)
+        if self.use_redis:
+            try:
+                redis_client = await self.redis_manager.get_async_client()
+                await redis_client.delete(self._key(user_id))
+            except Exception as e:
+                logger.warning(f"Principal cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._local.hits + self._local.misses
+        saved = self._local.hits + self.redis_hits
+        return {
+            "enabled": self.enabled,
+            "lookups": lookups,
+            "local": self._local.stats(),
+            "redis_hits": self.redis_hits,
+            "db_loads": self.db_loads,
+            "saved_db_calls": saved,
+            "hit_ratio": saved / lookups if lookups else 0.0,
+        }
+
+# Global principal cache
+principal_cache = PrincipalCache(
+    redis_manager,
+    enabled=settings.PRINCIPAL_CACHE_ENABLED,
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    local_ttl=settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+    use_redis=settings.PRINCIPAL_CACHE_REDIS_ENABLED,
+    redis_ttl=settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+)
@@ -0,0 +1,85 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import logging
+import random
+import time
+
+from app.config import settings
+from app.metrics import observe_dependency_call
+
+logger = logging.getLogger(__name__)
+
+class RequestQueryStats:
+    """Database queries made while serving one request"""
+
+    __slots__ = ("path", "count", "seconds", "shapes")
+
+    def __init__(self, path: str, detect_n_plus_one: bool):
+        self.path = path
+        self.count = 0
+        self.seconds = 0.0
+        # Query shape -> count, only collected when N+1 detection is on
+        self.shapes: Optional[Dict[str, int]] = {} if detect_n_plus_one else None
+
+    def repeated_queries(self, threshold: int) -> List[str]:
+        """Shapes run at least ``threshold`` times, e.g. "User.find_unique(id) x12" """
+        if not self.shapes:
+            return []
+        return [f"{shape} x{count}" for shape, count in self.shapes.items() if count >= threshold]
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+slow_queries: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+def begin_request(path: str) -> Token:
+    """Start collecting query stats for the current request"""
+    return _current.set(RequestQueryStats(path, settings.DB_DETECT_N_PLUS_ONE))
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+def end_request(token: Token) -> Optional[RequestQueryStats]:
+    """Stop collecting and return the request's stats, warning about N+1 patterns"""
+    stats = _current.get()
+    _current.reset(token)
+    if stats is not None:
+        for repeated in stats.repeated_queries(settings.DB_N_PLUS_ONE_THRESHOLD):
+            logger.warning("Possible N+1 query in %s: %s", stats.path, repeated)
+    return stats
+
+def query_shape(model: str, method: str, arguments: Optional[Dict[str, Any]]) -> str:
+    """Model, action and filtered fields of a query, without the values"""
+    where = (arguments or {}).get("where")
+    fields = ",".join(sorted(where)) if isinstance(where, dict) else ""
+    return f"{model}.{method}({fields})"
+
+@contextmanager
+def track_query(model: str, method: str, arguments: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    """Time one query into the request stats, metrics and slow-query samples"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        operation = f"{model}.{method}"
+        observe_dependency_call("db", operation, seconds)
+
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            if stats.shapes is not None:
+                shape = query_shape(model, method, arguments)
+                stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+
+        if seconds * 1000 >= settings.DB_SLOW_QUERY_MS and random.random() < settings.DB_SLOW_QUERY_SAMPLE_RATE:
+            sample = {
+                "query": query_shape(model, method, arguments),
+                "duration_ms": round(seconds * 1000, 2),
+                "path": stats.path if stats is not None else None,
+                "at": time.time(),
+            }
+            slow_queries.append(sample)
+            logger.warning("Slow query %s took %.1fms (%s)", sample["query"], sample["duration_ms"], sample["path"])
@@ -0,0 +1,265 @@
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import time
+
+from fastapi import Response
+
+from app.config import settings
+from app.metrics import observe_dependency_call
+from app.redis_client import RedisManager, redis_manager
+from app.utils.cache import TTLCache
+from app.utils.etag import etag_matches
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse(NamedTuple):
+    """An already-serialized JSON body plus the headers that go with it"""
+    body: bytes
+    headers: Dict[str, str]
+
+    def to_response(self, response: Optional[Response] = None, if_none_match: Optional[str] = None) -> Response:
+        """
+        JSON response for this body; ``response`` is the endpoint's injected
+        Response, whose headers (e.g. rate limit headers) FastAPI would not
+        copy onto a returned Response by itself. A bodiless 304 Not Modified
+        when ``if_none_match`` lists this entry's ETag.
+        """
+        etag = self.headers.get("ETag")
+        if etag is not None and etag_matches(if_none_match, etag):
+            result = Response(status_code=304, headers=self.headers)
+        else:
+            result = Response(content=self.body, media_type="application/json", headers=self.headers)
+        if response is not None:
+            result.raw_headers.extend(response.raw_headers)
+        return result
+
+class ResponseCache:
+    """
+    Cache of serialized JSON responses with tag-based invalidation.
+
+    Hits return stored bytes, skipping both the database and response model
+    validation. Entries carry tags (e.g. "user:42", "users"); invalidating a
+    tag turns every entry carrying it that was loaded before into a miss.
+    The in-process LRU has a short TTL so workers that did not see an
+    invalidation converge quickly; the optional Redis tier keeps tag
+    versions in Redis and is consistent across workers. Concurrent misses
+    for one key share a single load.
+
+    With read replicas a load right after a write may still see the old
+    row, so nothing is stored while one of the entry's tags was invalidated
+    less than ``settle_seconds`` ago (tracked in Redis too when it is on).
+    """
+
+    KEY_PREFIX = "response_cache:"
+
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        *,
+        enabled: bool = True,
+        maxsize: int = 2000,
+        local_ttl: float = 5,
+        use_redis: bool = False,
+        redis_ttl: float = 60,
+        settle_seconds: float = 0,
+    ):
+        self.redis_manager = redis_manager
+        self.enabled = enabled
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self.local_ttl = local_ttl
+        self.settle_seconds = settle_seconds
+        self._local: TTLCache[str, Tuple[CachedResponse, float]] = TTLCache(maxsize, ttl=local_ttl)
+        # Tag -> time.monotonic() of its last invalidation in this worker
+        self._invalidated_at: Dict[str, float] = {}
+        self._loads: Dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.coalesced = 0
+        self.loads = 0
+
+    def _fresh(self, tags: Sequence[str], loaded_at: float) -> bool:
+        """Whether none of ``tags`` was invalidated since ``loaded_at``"""
+        invalidated_at = self._invalidated_at
+        return all(invalidated_at.get(tag, -1.0) < loaded_at for tag in tags)
+
+    def _settled(self, tags: Sequence[str], loaded_at: float) -> bool:
+        """Whether no replica can still be behind an invalidation of ``tags``"""
+        if self.settle_seconds <= 0:
+            return True
+        return self._fresh(tags, loaded_at - self.settle_seconds)
+
+    async def get_or_load(
+        self,
+        key: str,
+        tags: Sequence[str],
+        loader: Callable[[], Awaitable[CachedResponse]],
+    ) -> CachedResponse:
+        """Return the cached response for ``key`` or build it with ``loader``"""
+        if not self.enabled:
+            return await loader()
+
+        entry = self._local.get(key)
+        if entry is not None and self._fresh(tags, entry[1]):
+            return entry[0]
+
+        while True:
+            pending = self._loads.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request doing the load went away; load it ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._loads[key] = future
+        loaded_at = time.monotonic()
+        try:
+            cached, storable = await self._load(key, tags, loader, self._settled(tags, loaded_at))
+            # Not stored if one of its tags was invalidated during the load
+            if storable and self._fresh(tags, loaded_at):
+                self._local.set(key, (cached, loaded_at))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; none is fine too
+            raise
+        else:
+            future.set_result(cached)
+            return cached
+        finally:
+            del self._loads[key]
+
+    async def _load(
+        self,
+        key: str,
+        tags: Sequence[str],
+        loader: Callable[[], Awaitable[CachedResponse]],
+        settled: bool,
+    ) -> Tuple[CachedResponse, bool]:
+        """The response and whether it may be stored"""
+        shared_versions = None
+        if self.use_redis:
+            cached, shared_versions, shared_settled = await self._get_shared(key, tags)
+            if cached is not None:
+                # Stored under the current tag versions, so after any settling
+                self.redis_hits += 1
+                return cached, True
+            settled = settled and shared_settled
+
+        cached = await loader()
+        self.loads += 1
+        if shared_versions is not None and settled:
+            await self._set_shared(key, cached, shared_versions)
+        return cached, settled
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.KEY_PREFIX}tag:{tag}"
+
+    def _settling_key(self, tag: str) -> str:
+        return f"{self.KEY_PREFIX}settling:{tag}"
+
+    async def _get_shared(
+        self, key: str, tags: Sequence[str]
+    ) -> Tuple[Optional[CachedResponse], Optional[List[int]], bool]:
+        """
+        Entry, current tag versions and whether no tag is still settling in
+        any worker, in one round trip; (None, None, True) if Redis failed
+        """
+        start = time.perf_counter()
+        try:
+            async with self.redis_manager.pipeline() as pipe:
+                pipe.hgetall(self._entry_key(key))
+                for tag in tags:
+                    pipe.get(self._tag_key(tag))
+                if tags:
+                    pipe.exists(*(self._settling_key(tag) for tag in tags))
+                entry, *replies = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None, None, True
+        finally:
+            observe_dependency_call("redis", "response_cache", time.perf_counter() - start)
+
+        raw_versions, settling = replies[:len(tags)], replies[len(tags):]
+        versions = [int(version or 0) for version in raw_versions]
+        if entry and json.loads(entry["versions"]) == versions:
+            return CachedResponse(entry["body"].encode(), json.loads(entry["headers"])), versions, True
+        return None, versions, not any(settling)
+
+    async def _set_shared(self, key: str, cached: CachedResponse, versions: List[int]) -> None:
+        try:
+            async with self.redis_manager.pipeline() as pipe:
+                entry_key = self._entry_key(key)
+                pipe.hset(entry_key, mapping={
+                    "body": cached.body.decode(),
+                    "headers": json.dumps(cached.headers),
+                    "versions": json.dumps(versions),
+                })
+                pipe.pexpire(entry_key, int(self.redis_ttl * 1000))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    async def invalidate(self, *tags: str) -> None:
+        """Turn every entry tagged with any of ``tags`` into a miss"""
+        now = time.monotonic()
+        if len(self._invalidated_at) > self._local.maxsize:
+            # Entries loaded before these invalidations have all expired and settled
+            horizon = now - max(self.local_ttl, self.settle_seconds)
+            self._invalidated_at = {
+                tag: at for tag, at in self._invalidated_at.items() if at >= horizon
+            }
+        for tag in tags:
+            self._invalidated_at[tag] = now
+        if self.use_redis and tags:
+            try:
+                async with self.redis_manager.pipeline() as pipe:
+                    for tag in tags:
+                        pipe.incr(self._tag_key(tag))
+                        # Outlive every entry stored under the old version
+                        pipe.expire(self._tag_key(tag), int(self.redis_ttl * 2) + 1)
+                        if self.settle_seconds > 0:
+                            pipe.set(self._settling_key(tag), 1, px=int(self.settle_seconds * 1000))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Response cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        self._local.clear()
+        self._invalidated_at.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._local.hits + self._local.misses
+        saved = lookups - self.loads
+        return {
+            "enabled": self.enabled,
+            "lookups": lookups,
+            "local": self._local.stats(),
+            "redis_hits": self.redis_hits,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "hit_ratio": saved / lookups if lookups else 0.0,
+        }
+
+# Global response cache
+response_cache = ResponseCache(
+    redis_manager,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    maxsize=settings.RESPONSE_CACHE_MAX_SIZE,
+    local_ttl=settings.RESPONSE_CACHE_LOCAL_TTL_SECONDS,
+    use_redis=settings.RESPONSE_CACHE_REDIS_ENABLED,
+    redis_ttl=settings.RESPONSE_CACHE_REDIS_TTL_SECONDS,
+    # Replicas can lag a write by up to the read-your-writes window
+    settle_seconds=settings.DB_READ_YOUR_WRITES_SECONDS if settings.DATABASE_REPLICA_URLS else 0,
+)
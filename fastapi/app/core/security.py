@@ -1,14 +1,24 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Callable, Dict, Union, Optional
 from jose import jwt
 from passlib.context import CryptContext
 from prisma import Prisma
 from prisma.models import User
 
 from app.config import settings
+from app.core.principal_cache import principal_cache
+from app.utils.cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified claims by SHA-256 of the raw token, each held until its exp
+claims_cache: TTLCache[bytes, Dict[str, Any]] = TTLCache(settings.TOKEN_CLAIMS_CACHE_MAX_SIZE)
+
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
 ) -> str:
@@ -28,16 +38,105 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordHashPoolSaturated(Exception):
+    """Raised when the password hashing pool has no room for another job"""
+
+class PasswordHashPool:
+    """
+    Bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so a few threads keep the event
+    loop free. Jobs beyond ``max_workers + max_pending`` are rejected
+    immediately instead of queueing behind a login burst.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash",
+            )
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                raise PasswordHashPoolSaturated()
+            self._in_flight += 1
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Released when the job actually finishes, even if the awaiting
+        # request is cancelled, so the bound reflects real thread usage
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hash_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool instead of the event loop"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing pool instead of the event loop"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a JWT and return its claims, memoized until the token expires.
+    Raises jwt.JWTError for invalid tokens (which are never cached).
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = claims_cache.get(key)
+    if payload is not None:
+        return payload
+    
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    exp = payload.get("exp")
+    if exp is not None:
+        claims_cache.set(key, payload, ttl=exp - time.time())
+    return payload
+
 async def verify_token(token: str, db: Prisma) -> Optional[User]:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
     except jwt.JWTError:
         return None
     
-    user = await db.user.find_unique(where={"id": int(user_id)})
-    return user
\ No newline at end of file
+    user_id = int(user_id)
+    return await principal_cache.get_or_load(
+        user_id,
+        lambda: db.user.find_unique(where={"id": user_id}),
+        expires_at=payload.get("exp"),
+    )
\ No newline at end of file
@@ -1,17 +1,250 @@
+from fastapi import Request
 from prisma import Prisma
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import asyncio
+import logging
+import time
+
+from app.config import Settings, settings
+from app.core.query_tracking import track_query
+from app.rate_limiting import get_user_id_or_ip
+from app.redis_client import RedisManager, redis_manager
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+def build_database_url(url: str, config: Settings = settings) -> str:
+    """``url`` with the pool settings applied as Prisma connection parameters"""
+    params = {
+        "connection_limit": config.DB_CONNECTION_LIMIT,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "connect_timeout": config.DB_CONNECT_TIMEOUT,
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "pgbouncer": "true" if config.DB_PGBOUNCER else None,
+    }
+    params = {name: str(value) for name, value in params.items() if value is not None}
+    if not params:
+        return url
+    
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def _datasource(config: Settings = settings) -> Optional[dict]:
+    url = build_database_url(config.DATABASE_URL, config)
+    # Without pool settings Prisma reads DATABASE_URL itself
+    return {"url": url} if url != config.DATABASE_URL else None
+
+class InstrumentedPrisma(Prisma):
+    """
+    Prisma client that times every query (count, DB time, slow-query samples,
+    N+1 shapes) via app.core.query_tracking. Transaction clients are copies of
+    this class, so queries inside ``tx()`` are tracked too.
+    """
+
+    # Queries in flight on this client, for least-outstanding replica selection
+    outstanding = 0
+
+    async def _execute(self, *, method, arguments, model=None, root_selection=None):
+        self.outstanding += 1
+        try:
+            with track_query(model.__name__ if model is not None else "raw", method, arguments):
+                return await super()._execute(
+                    method=method, arguments=arguments, model=model, root_selection=root_selection
+                )
+        finally:
+            self.outstanding -= 1
+
+    def batch_(self):
+        batch = super().batch_()
+        commit = batch.commit
+
+        # A batch is sent as one engine call; time it as one query
+        async def tracked_commit() -> None:
+            with track_query("batch", "commit"):
+                await commit()
+
+        batch.commit = tracked_commit
+        return batch
+
+class ReplicaRouter:
+    """
+    Routes read-only queries to read replicas.
+
+    Reads go to the healthy replica with the fewest queries in flight (ties
+    rotate round-robin), or to the primary when none is healthy. A background
+    task re-checks every replica periodically. After a principal writes, its
+    reads stay on the primary for ``sticky_seconds`` so it sees its own
+    changes despite replication lag. The window is kept in Redis (when
+    given) so it holds across workers, with a per-worker copy in front;
+    while Redis is unreachable only this worker's writes are known.
+    """
+
+    KEY_PREFIX = "db_recent_write:"
+
+    def __init__(
+        self,
+        primary: Prisma,
+        replicas: Sequence[Prisma] = (),
+        health_check_interval: float = settings.DB_REPLICA_HEALTH_CHECK_SECONDS,
+        health_check_timeout: float = settings.DB_REPLICA_HEALTH_CHECK_TIMEOUT,
+        sticky_seconds: float = settings.DB_READ_YOUR_WRITES_SECONDS,
+        max_sticky_principals: int = 100_000,
+        redis_manager: Optional[RedisManager] = None,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.healthy = [True] * len(self.replicas)
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.sticky_seconds = sticky_seconds
+        self.redis_manager = redis_manager
+        self._recent_writers: TTLCache[str, bool] = TTLCache(max_sticky_principals, ttl=sticky_seconds)
+        self._next = 0
+        self._checker: Optional[asyncio.Task] = None
+
+    async def record_write(self, principal: str) -> None:
+        """Pin the principal's reads to the primary for the sticky window, in every worker"""
+        if not self.replicas:
+            return
+        self._recent_writers.set(principal, True)
+        if self.redis_manager is not None:
+            try:
+                redis_client = await self.redis_manager.get_async_client()
+                await redis_client.set(
+                    f"{self.KEY_PREFIX}{principal}", 1, px=int(self.sticky_seconds * 1000)
+                )
+            except Exception as e:
+                logger.warning(f"Recording a write for read-your-writes failed: {e}")
+
+    async def wrote_recently(self, principal: str) -> bool:
+        """Whether the principal wrote within the sticky window (on any worker)"""
+        if self._recent_writers.get(principal):
+            return True
+        if self.redis_manager is None:
+            return False
+        try:
+            redis_client = await self.redis_manager.get_async_client()
+            return bool(await redis_client.exists(f"{self.KEY_PREFIX}{principal}"))
+        except Exception as e:
+            logger.warning(f"Read-your-writes lookup failed: {e}")
+            return False
+
+    async def for_read(self, principal: Optional[str] = None, primary: Optional[Prisma] = None) -> Prisma:
+        """Client to run a read on (``primary`` overrides the router's own primary)"""
+        primary = primary or self.primary
+        if not self.replicas or (principal is not None and await self.wrote_recently(principal)):
+            return primary
+        
+        count = len(self.replicas)
+        best = None
+        for offset in range(count):
+            index = (self._next + offset) % count
+            if not self.healthy[index]:
+                continue
+            if best is None or self.replicas[index].outstanding < self.replicas[best].outstanding:
+                best = index
+        if best is None:
+            return primary
+        self._next = (best + 1) % count
+        return self.replicas[best]
+
+    async def _check(self, replica: Prisma) -> bool:
+        try:
+            if not replica.is_connected():
+                # Starting the query engine takes longer than a probe; Prisma's
+                # own connect timeout bounds it
+                await replica.connect()
+            await asyncio.wait_for(replica.query_raw("SELECT 1"), self.health_check_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def check_health(self) -> List[bool]:
+        """Probe every replica (reconnecting if needed) and update the healthy flags"""
+        results = await asyncio.gather(*[self._check(replica) for replica in self.replicas])
+        for index, healthy in enumerate(results):
+            if healthy != self.healthy[index]:
+                state = "healthy again" if healthy else "unhealthy, reading from the others"
+                logger.warning(f"Database replica {index} is {state}")
+        self.healthy = list(results)
+        return self.healthy
+
+    async def connect(self):
+        """Connect and warm up the replicas; failures only mark a replica unhealthy"""
+        await self.check_health()
+        await asyncio.gather(*[
+            warm_up_database(client=replica)
+            for replica, healthy in zip(self.replicas, self.healthy) if healthy
+        ])
+
+    async def start(self):
+        """Re-check replica health in the background"""
+        if self.replicas and (self._checker is None or self._checker.done()):
+            self._checker = asyncio.create_task(self._run_health_checks())
+
+    async def _run_health_checks(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_health()
+
+    async def stop(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+
+    async def disconnect(self):
+        for replica in self.replicas:
+            if replica.is_connected():
+                await replica.disconnect()
 
 # Global Prisma instance
-prisma = Prisma()
+prisma = InstrumentedPrisma(datasource=_datasource())
+
+# Read replicas, routed to by get_read_db
+db_router = ReplicaRouter(
+    prisma,
+    [
+        InstrumentedPrisma(datasource={"url": build_database_url(url)})
+        for url in settings.DATABASE_REPLICA_URLS
+    ],
+    redis_manager=redis_manager,
+)
 
 async def connect_database():
     """Connect to database on startup"""
     await prisma.connect()
+    await db_router.connect()
+
+async def warm_up_database(
+    connections: int = settings.DB_WARMUP_CONNECTIONS,
+    query: str = settings.DB_WARMUP_QUERY,
+    client: Optional[Prisma] = None,
+) -> None:
+    """Open pool connections up front by running ``connections`` queries at once"""
+    if connections <= 0:
+        return
+    client = client or prisma
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[client.query_raw(query) for _ in range(connections)])
+    except Exception as e:
+        logger.warning(f"Database warm-up failed: {e}")
+        return
+    logger.info(f"Database warmed up with {connections} connections in {time.perf_counter() - start:.3f}s")
 
 async def disconnect_database():
     """Disconnect from database on shutdown"""
+    await db_router.stop()
     await prisma.disconnect()
+    await db_router.disconnect()
 
 @asynccontextmanager
 async def get_database() -> AsyncGenerator[Prisma, None]:
@@ -19,7 +252,14 @@ async def get_database() -> AsyncGenerator[Prisma, None]:
     async with prisma.tx() as transaction:
         yield transaction
 
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
 # Dependency for FastAPI
-async def get_db() -> Prisma:
-    """FastAPI dependency to get database instance"""
-    return prisma
\ No newline at end of file
+async def get_db(request: Request) -> AsyncGenerator[Prisma, None]:
+    """FastAPI dependency to get the primary database instance"""
+    try:
+        yield prisma
+    finally:
+        # The principal is known by now; keep its reads on the primary for a while
+        if request.method not in SAFE_METHODS:
+            await db_router.record_write(get_user_id_or_ip(request))
@@ -1,14 +1,12 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from prisma import Prisma
 from prisma.models import User
 from typing import Optional
-from jose import JWTError, jwt
 import logging
 
-from app.database import get_db
+from app.database import db_router, get_db
 from app.core.security import verify_token
-from app.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -19,32 +17,54 @@ security = HTTPBearer(auto_error=False)
 # Core Authentication Dependencies (USED)
 # =========================
 
-async def get_current_user_optional(
+async def resolve_principal(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Prisma = Depends(get_db)
 ) -> Optional[User]:
     """
-    Get current user if authenticated, return None if not
-    USED IN: Rate limiting, optional auth endpoints
+    Verify the bearer token once per request (FastAPI caches the result
+    for every dependency that needs it) and store the user on request.state
+    USED IN: Rate limiting, all auth dependencies
     """
     if not credentials:
         return None
     
     try:
         user = await verify_token(credentials.credentials, db)
-        if user:
-            # Store user in request state for rate limiting
-            request.state.user = user
-        return user
     except Exception as e:
         logger.warning(f"Token verification failed: {e}")
         return None
+    
+    if user:
+        # Store user in request state for rate limiting
+        request.state.user = user
+    return user
 
-async def get_current_user(
+async def get_read_db(
     request: Request,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Prisma = Depends(get_db)
+    db: Prisma = Depends(get_db),
+    user: Optional[User] = Depends(resolve_principal)
+) -> Prisma:
+    """
+    Database for read-only endpoints: a replica, or the primary while this
+    principal has written recently (read-your-writes)
+    USED IN: GET /users/, GET /users/{id}
+    """
+    return await db_router.for_read(get_user_id_or_ip(request), primary=db)
+
+async def get_current_user_optional(
+    user: Optional[User] = Depends(resolve_principal)
+) -> Optional[User]:
+    """
+    Get current user if authenticated, return None if not
+    USED IN: Optional auth endpoints
+    """
+    return user
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    user: Optional[User] = Depends(resolve_principal)
 ) -> User:
     """
     Get current authenticated user (required)
@@ -57,31 +77,20 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    try:
-        user = await verify_token(credentials.credentials, db)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Inactive user account",
-            )
-        
-        # Store user in request state for rate limiting
-        request.state.user = user
-        return user
-        
-    except JWTError:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user account",
+        )
+    
+    return user
 
 async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
@@ -100,123 +109,20 @@ async def get_current_admin_user(
     return current_user
 
 # =========================
-# Rate Limiting Helper (USED)
+# Rate Limiting Helpers (USED)
 # =========================
 
-def get_user_type_from_request(request: Request) -> str:
-    """
-    Get user type from request state for rate limiting
-    USED IN: Rate limiting logic
-    """
-    user = getattr(request.state, 'user', None)
-    if not user:
-        return "anonymous"
-    
-    role = getattr(user, 'role', 'user')
-    if role == 'admin' or role == 'premium':
-        return "premium"
-    elif role == 'user':
-        return "authenticated"
-    else:
-        return "authenticated"
-
-# =========================
-# Simplified Rate Limiting Functions (USED)
-# =========================
+# Single implementation lives in app.rate_limiting
+from app.rate_limiting import enforce_policy, get_user_id_or_ip
 
-from slowapi.util import get_remote_address
-
-def get_user_id_or_ip(request: Request) -> str:
-    """
-    Get user ID if authenticated, otherwise use IP address
-    USED IN: slowapi key function
-    """
-    user = getattr(request.state, 'user', None)
-    if user and hasattr(user, 'id'):
-        return f"user:{user.id}"
-    
-    ip_address = get_remote_address(request)
-    return f"ip:{ip_address}"
-
-def get_endpoint_category(request: Request) -> str:
-    """
-    Categorize endpoint for different rate limits
-    USED IN: Rate limiting configuration
-    """
-    path = request.url.path
-    method = request.method
-    
-    # Health check endpoints
-    if path in ["/health", "/", "/docs", "/redoc", "/openapi.json"]:
-        return "health"
-    
-    # Authentication endpoints
-    if "/auth/" in path:
-        if "login" in path:
-            return "auth_login"
-        elif "register" in path:
-            return "auth_register"
-        return "auth"
-    
-    # API endpoints
-    if path.startswith("/api/"):
-        if method in ["GET", "HEAD", "OPTIONS"]:
-            return "api_read"
-        elif method in ["POST", "PUT", "PATCH", "DELETE"]:
-            return "api_write"
-    
-    return "default"
-
-def is_whitelisted_ip(request: Request) -> bool:
-    """
-    Check if IP is whitelisted
-    USED IN: Rate limiting bypass
-    """
-    ip_address = get_remote_address(request)
-    whitelist = getattr(settings, 'RATE_LIMIT_WHITELIST', ['127.0.0.1', '::1'])
-    return ip_address in whitelist
-
-def get_rate_limit_for_request(request: Request) -> str:
+async def enforce_rate_limit(
+    request: Request,
+    response: Response,
+    user: Optional[User] = Depends(resolve_principal)
+) -> None:
     """
-    Get appropriate rate limit for the request
-    USED IN: Dynamic rate limiting
+    Apply the user-type policy for this route: one limiter check per
+    request, keyed by user ID when authenticated and by IP otherwise
+    USED IN: API router (every v1 endpoint)
     """
-    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
-        return "10000/minute"
-    
-    if is_whitelisted_ip(request):
-        return "10000/minute"
-    
-    user_type = get_user_type_from_request(request)
-    endpoint_category = get_endpoint_category(request)
-    
-    # Rate limits configuration
-    rate_limits = {
-        # Anonymous users
-        "anonymous": {
-            "default": "50/hour",
-            "auth_login": "10/hour",
-            "auth_register": "3/hour",
-            "api_read": "100/hour",
-            "api_write": "20/hour",
-            "health": "1000/minute"
-        },
-        # Authenticated users
-        "authenticated": {
-            "default": "1000/hour",
-            "api_read": "5000/hour",
-            "api_write": "1000/hour",
-            "health": "1000/minute"
-        },
-        # Premium users (admin, premium role)
-        "premium": {
-            "default": "10000/hour",
-            "api_read": "50000/hour",
-            "api_write": "10000/hour",
-            "health": "1000/minute"
-        }
-    }
-    
-    # Get rate limit for user type and endpoint
-    user_limits = rate_limits.get(user_type, rate_limits["anonymous"])
-    return user_limits.get(endpoint_category, user_limits.get("default", "100/hour"))
+    await enforce_policy(request, response)
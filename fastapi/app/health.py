@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import prisma
+from app.redis_client import redis_manager
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CheckResult:
+    healthy: bool
+    latency_ms: float
+    checked_at: float  # time.monotonic()
+    error: Optional[str] = None
+
+class HealthMonitor:
+    """
+    Dependency checks run by a background task every few seconds.
+
+    Probes only read the cached results, so probing never touches the
+    database or Redis and a probe storm cannot add load to them. A result
+    older than ``stale_after`` counts as failed, which also catches a
+    checker that has stopped running.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Callable[[], Awaitable[Any]]],
+        required: Iterable[str] = settings.READINESS_CHECKS,
+        interval: float = settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        stale_after: float = settings.HEALTH_CHECK_STALE_SECONDS,
+    ):
+        self.checks = checks
+        self.required = [name for name in required if name in checks]
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.results: Dict[str, CheckResult] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_check(self, name: str) -> CheckResult:
+        start = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(self.checks[name](), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        result = CheckResult(
+            healthy=error is None,
+            latency_ms=round((time.perf_counter() - start) * 1000, 2),
+            checked_at=time.monotonic(),
+            error=error,
+        )
+        previous = self.results.get(name)
+        if previous is not None and previous.healthy != result.healthy:
+            logger.warning(f"Health check {name} is now {'passing' if result.healthy else 'failing'}: {error}")
+        self.results[name] = result
+        return result
+
+    async def run_checks(self) -> Dict[str, CheckResult]:
+        """Run all checks concurrently and cache the results"""
+        await asyncio.gather(*[self._run_check(name) for name in self.checks])
+        return self.results
+
+    def _passing(self, name: str, now: float) -> bool:
+        result = self.results.get(name)
+        return result is not None and result.healthy and now - result.checked_at <= self.stale_after
+
+    def is_ready(self) -> bool:
+        now = time.monotonic()
+        return all(self._passing(name, now) for name in self.required)
+
+    def report(self) -> Dict[str, Any]:
+        """Readiness plus the latest result of each check"""
+        now = time.monotonic()
+        checks = {}
+        for name in self.checks:
+            result = self.results.get(name)
+            if result is None:
+                checks[name] = {"status": "pending"}
+                continue
+            checks[name] = {
+                "status": "pass" if self._passing(name, now) else "fail",
+                "latency_ms": result.latency_ms,
+                "age_seconds": round(now - result.checked_at, 3),
+                "required": name in self.required,
+            }
+            if result.error:
+                checks[name]["error"] = result.error
+        return {"status": "ready" if self.is_ready() else "not ready", "checks": checks}
+
+    async def start(self):
+        """Run the checks once, then keep re-running them in the background"""
+        await self.run_checks()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.warning(f"Health checks failed to run: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+async def check_database():
+    await prisma.query_raw("SELECT 1")
+
+async def check_redis():
+    redis_client = await redis_manager.get_async_client()
+    await redis_client.ping()
+
+# Global health monitor
+health_monitor = HealthMonitor({"database": check_database, "redis": check_redis})
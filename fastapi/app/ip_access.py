@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional
+import asyncio
+import ipaddress
+import logging
+
+from app.redis_client import RedisManager, redis_manager
+from app.utils.ip_prefix import PrefixSet
+
+logger = logging.getLogger(__name__)
+
+LIST_NAMES = ("allow", "deny")
+
+class IPAccessLists:
+    """
+    Runtime-managed IP allow/deny lists (addresses or CIDR ranges).
+
+    Entries are persisted in Redis sets; every worker keeps them as
+    immutable PrefixSets and reloads when a change is published, so a
+    change reaches all workers within one pub/sub round trip.
+    """
+
+    def __init__(self, redis_manager: RedisManager, prefix: str = "ip_access"):
+        self.redis_manager = redis_manager
+        self.prefix = prefix
+        self.channel = f"{prefix}:changed"
+        self.allow = PrefixSet()
+        self.deny = PrefixSet()
+        self._listener: Optional[asyncio.Task] = None
+
+    def _key(self, list_name: str) -> str:
+        return f"{self.prefix}:{list_name}"
+
+    @staticmethod
+    def normalize(network: str) -> str:
+        """Canonical form of an address or CIDR range; raises ValueError if invalid"""
+        parsed = ipaddress.ip_network(network.strip(), strict=False)
+        if parsed.prefixlen == parsed.max_prefixlen:
+            return str(parsed.network_address)
+        return str(parsed)
+
+    @staticmethod
+    def _build(entries: List[str]) -> PrefixSet:
+        valid = []
+        for entry in entries:
+            try:
+                ipaddress.ip_network(entry, strict=False)
+                valid.append(entry)
+            except ValueError:
+                logger.warning(f"Ignoring invalid IP access list entry: {entry!r}")
+        return PrefixSet(valid)
+
+    async def load(self):
+        """Replace the in-process lists with what is stored in Redis"""
+        async with self.redis_manager.pipeline() as pipe:
+            for list_name in LIST_NAMES:
+                pipe.smembers(self._key(list_name))
+            allow, deny = await pipe.execute()
+        self.allow, self.deny = self._build(list(allow)), self._build(list(deny))
+
+    async def _change(self, list_name: str, network: str, add: bool) -> bool:
+        if list_name not in LIST_NAMES:
+            raise ValueError(f"Unknown IP access list: {list_name}")
+        entry = self.normalize(network)
+        async with self.redis_manager.pipeline() as pipe:
+            if add:
+                pipe.sadd(self._key(list_name), entry)
+            else:
+                pipe.srem(self._key(list_name), entry)
+            pipe.publish(self.channel, list_name)
+            changed, _ = await pipe.execute()
+        # Apply locally right away rather than waiting for our own message
+        await self.load()
+        return bool(changed)
+
+    async def add(self, list_name: str, network: str) -> bool:
+        """Add an address or range; False if it was already listed"""
+        return await self._change(list_name, network, add=True)
+
+    async def remove(self, list_name: str, network: str) -> bool:
+        """Remove an address or range; False if it was not listed"""
+        return await self._change(list_name, network, add=False)
+
+    def entries(self) -> Dict[str, List[str]]:
+        return {"allow": list(self.allow), "deny": list(self.deny)}
+
+    async def start(self):
+        """Load the lists and follow changes published by other workers"""
+        if self._listener is None or self._listener.done():
+            # Loaded before startup finishes so denied IPs are never let through;
+            # if Redis is down the listener keeps retrying
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Initial IP access list load failed: {e}")
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        # Waking up at least this often lets the health check PING an idle connection
+        poll_seconds = self.redis_manager.health_check_interval or 30
+        while True:
+            subscriber = self.redis_manager.create_subscriber()
+            pubsub = subscriber.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(timeout=poll_seconds)
+                    # A subscribe confirmation also follows every silent
+                    # reconnect; reloading then covers changes published
+                    # while no subscription was active
+                    if message is not None and message["type"] in ("subscribe", "message"):
+                        await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"IP access list listener error, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+                await subscriber.aclose()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+# Global IP access lists
+ip_access_lists = IPAccessLists(redis_manager)
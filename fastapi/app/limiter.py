@@ -0,0 +1,447 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import logging
+import math
+import re
+import time
+
+from redis.exceptions import NoScriptError, RedisError
+
+from app.metrics import observe_dependency_call
+from app.redis_client import RedisManager
+from app.utils.cache import TTLCache
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# What a limiter call raises when Redis is down, too slow, or skipped by the breaker
+BACKEND_ERRORS = (CircuitOpenError, RedisError, OSError)
+
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+
+@dataclass(frozen=True)
+class Rate:
+    """A parsed limit such as "100/minute" or "10/2 hours" """
+    limit: int
+    period: float  # seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        match = RATE_PATTERN.match(value.lower())
+        if not match:
+            raise ValueError(f"Invalid rate limit: {value!r}")
+        count, multiplier, unit = match.groups()
+        return cls(int(count), int(multiplier or 1) * PERIODS[unit])
+
+    @property
+    def emission_interval_ms(self) -> float:
+        """Time it takes to earn back one request"""
+        return self.period * 1000 / self.limit
+
+    def __str__(self) -> str:
+        return f"{self.limit}/{self.period:g}s"
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the full quota is available again
+    retry_after: float  # seconds until the next request may succeed (0 if allowed)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+# Generic cell rate algorithm: the theoretical arrival time (TAT) in ms is
+# kept per bucket as a field of one hash per principal, so all of a
+# principal's counters live under one key and reset is a single DEL. One
+# call checks and updates it atomically using Redis' own clock, so workers
+# with skewed clocks still agree. A call may take several tokens at once (a
+# lease) and hand back unspent tokens from an older lease. A field whose TAT
+# has passed means the same as a missing one, so stale fields are harmless;
+# the hash expires once its longest-lived bucket would be full again.
+#   KEYS[1] = principal hash key
+#   ARGV[1] = emission interval (ms), ARGV[2] = limit,
+#   ARGV[3] = tokens wanted, ARGV[4] = tokens refunded, ARGV[5] = bucket
+# Returns {granted, remaining, reset_ms, retry_ms}; granted = 0 means denied
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local refund = tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local function store(value, ttl)
+  redis.call('HSET', KEYS[1], ARGV[5], value)
+  if redis.call('PTTL', KEYS[1]) < ttl then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+  end
+end
+local tat = (tonumber(redis.call('HGET', KEYS[1], ARGV[5])) or now) - refund * interval
+if tat < now then
+  tat = now
+end
+local window = interval * limit
+local available = math.floor((now + window - tat) / interval)
+if available < 1 then
+  if refund > 0 then
+    store(tat, math.ceil(tat - now) + 1)
+  end
+  return {0, 0, math.ceil(tat - now), math.ceil(tat + interval - window - now)}
+end
+local granted = math.min(wanted, available)
+local new_tat = tat + granted * interval
+store(new_tat, math.ceil(new_tat - now))
+return {granted, available - granted, math.ceil(new_tat - now), 0}
+"""
+
+class RedisRateLimiter:
+    """
+    Async GCRA rate limiter: one EVALSHA per check on the shared async
+    Redis client from RedisManager.
+
+    Checks issued in the same event loop iteration are sent together in one
+    non-transactional pipeline, so concurrent requests share a round trip
+    instead of each paying the client's per-command overhead.
+    """
+
+    def __init__(
+        self, redis_manager: RedisManager, prefix: str = "rate_limit", breaker: Optional[CircuitBreaker] = None
+    ):
+        self.redis_manager = redis_manager
+        self.prefix = prefix
+        self.breaker = breaker
+        self._sha: Optional[str] = None
+        self._pending: List[Tuple[str, str, Rate, int, int, asyncio.Future]] = []
+        self._flush_scheduled = False
+        # The loop only keeps weak references to tasks
+        self._flushes: Set[asyncio.Task] = set()
+
+    def _key(self, key: str) -> str:
+        # Hash tag: a principal's key maps to one slot on Redis Cluster
+        return f"{self.prefix}:{{{key}}}"
+
+    async def hit(self, key: str, rate: Rate, bucket: str = "") -> RateLimitResult:
+        """Consume one request from ``bucket`` of principal ``key``'s quota"""
+        _, result = await self.lease(key, rate, 1, bucket=bucket)
+        return result
+
+    async def lease(
+        self, key: str, rate: Rate, tokens: int, refund: int = 0, bucket: str = ""
+    ) -> Tuple[int, RateLimitResult]:
+        """
+        Take up to ``tokens`` from ``bucket`` of principal ``key`` after
+        returning ``refund`` unspent ones. Returns how many were granted
+        (0 when denied).
+        """
+        if self.breaker is not None:
+            self.breaker.reject_if_open()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((self._key(key), bucket, rate, tokens, refund, future))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            task = loop.create_task(self._flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+        granted, remaining, reset_ms, retry_ms = await future
+        return int(granted), RateLimitResult(
+            allowed=granted > 0,
+            limit=rate.limit,
+            remaining=int(remaining),
+            reset_after=int(reset_ms) / 1000,
+            retry_after=int(retry_ms) / 1000,
+        )
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        self._flush_scheduled = False
+        try:
+            replies = await self._eval_batch(batch)
+        except Exception as e:
+            replies = [e] * len(batch)
+
+        for (*_, future), reply in zip(batch, replies):
+            if future.done():
+                continue
+            if isinstance(reply, Exception):
+                future.set_exception(reply)
+            else:
+                future.set_result(reply)
+
+    async def _eval_batch(self, batch: List[Tuple[str, str, Rate, int, int, asyncio.Future]]) -> List[Any]:
+        start = time.perf_counter()
+        try:
+            if self.breaker is None:
+                return await self._eval_batch_once(batch)
+            return await self.breaker.call(self._eval_batch_once, batch)
+        finally:
+            observe_dependency_call("redis", "rate_limit", time.perf_counter() - start)
+
+    async def _eval_batch_once(self, batch: List[Tuple[str, str, Rate, int, int, asyncio.Future]]) -> List[Any]:
+        redis_client = await self.redis_manager.get_async_client()
+        if self._sha is None:
+            self._sha = await redis_client.script_load(GCRA_SCRIPT)
+
+        # Retry once if Redis lost the script (restart or SCRIPT FLUSH)
+        for _ in range(2):
+            if len(batch) == 1:
+                key, bucket, rate, tokens, refund, _ = batch[0]
+                try:
+                    replies = [await redis_client.evalsha(
+                        self._sha, 1, key, repr(rate.emission_interval_ms), rate.limit, tokens, refund, bucket
+                    )]
+                except NoScriptError as e:
+                    replies = [e]
+            else:
+                pipe = redis_client.pipeline(transaction=False)
+                for key, bucket, rate, tokens, refund, _ in batch:
+                    pipe.evalsha(
+                        self._sha, 1, key, repr(rate.emission_interval_ms), rate.limit, tokens, refund, bucket
+                    )
+                replies = await pipe.execute(raise_on_error=False)
+
+            if not any(isinstance(reply, NoScriptError) for reply in replies):
+                break
+            self._sha = await redis_client.script_load(GCRA_SCRIPT)
+        return replies
+
+    async def reset(self, keys: Iterable[str], chunk_size: int = 1000) -> int:
+        """Drop all counters of the given principals; returns how many had any"""
+        keys = list(keys)
+        deleted = 0
+        for start in range(0, len(keys), chunk_size):
+            async with self.redis_manager.pipeline() as pipe:
+                for key in keys[start:start + chunk_size]:
+                    pipe.unlink(self._key(key))
+                deleted += sum(await pipe.execute())
+        return deleted
+
+class LocalRateLimiter:
+    """
+    In-process GCRA used while Redis is unreachable.
+
+    Each worker enforces ``limit // workers`` of every rate so the fleet as
+    a whole stays close to the global limit. Requests it allows are counted
+    so they can be charged to Redis once it is back; like the GCRA state,
+    at most ``maxsize`` buckets are tracked, dropping the least recently
+    used one first.
+    """
+
+    def __init__(self, workers: int = 1, maxsize: int = 100000):
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._tats: TTLCache[Tuple[str, str], float] = TTLCache(maxsize)
+        self.spent: "OrderedDict[Tuple[str, str], Tuple[Rate, int]]" = OrderedDict()
+        self.hits = 0
+        self.denials = 0
+
+    def scaled(self, rate: Rate) -> Rate:
+        return Rate(max(1, rate.limit // self.workers), rate.period)
+
+    def hit(self, key: str, rate: Rate, bucket: str = "") -> RateLimitResult:
+        local = self.scaled(rate)
+        interval = local.period / local.limit
+        now = time.monotonic()
+        slot = (key, bucket)
+        tat = max(self._tats.get(slot) or now, now)
+        available = math.floor((now + local.period - tat) / interval)
+        if available < 1:
+            self.denials += 1
+            return RateLimitResult(False, local.limit, 0, tat - now, tat + interval - local.period - now)
+
+        new_tat = tat + interval
+        self._tats.set(slot, new_tat, ttl=new_tat - now)
+        spent_rate, count = self.spent.get(slot, (rate, 0))
+        self.spent[slot] = (spent_rate, count + 1)
+        self.spent.move_to_end(slot)
+        if len(self.spent) > self.maxsize:
+            self.spent.popitem(last=False)
+        self.hits += 1
+        return RateLimitResult(True, local.limit, available - 1, new_tat - now, 0.0)
+
+    def drain(self) -> Dict[Tuple[str, str], Tuple[Rate, int]]:
+        """Take the allowed-request counts and start over"""
+        spent, self.spent = self.spent, OrderedDict()
+        self._tats.clear()
+        return spent
+
+class _Lease:
+    __slots__ = ("tokens", "global_remaining", "reset_at", "expires_at", "retry_at")
+
+    def __init__(
+        self,
+        tokens: int,
+        global_remaining: int,
+        reset_at: float,
+        expires_at: float,
+        retry_at: float = 0.0,
+    ):
+        self.tokens = tokens
+        self.global_remaining = global_remaining
+        self.reset_at = reset_at
+        self.expires_at = expires_at
+        self.retry_at = retry_at  # set when Redis denied; deny locally until then
+
+class LeasedRateLimiter:
+    """
+    Per-worker token bucket in front of RedisRateLimiter.
+
+    For keys with a lease fraction, a worker takes ``limit * fraction``
+    tokens from Redis at once and spends them locally, going back to Redis
+    only when the lease is used up or older than ``lease_ttl``. Unspent
+    tokens from a stale lease are refunded in the same call, concurrent
+    refills of one key share a single call, and a denial is remembered
+    locally until its retry time. Across workers the count can run ahead of
+    the limit by at most the tokens leased but not yet spent
+    (workers * chunk); a fraction of 0 checks Redis on every request.
+
+    With a ``fallback``, a failed Redis call (down, slow, or breaker open)
+    is answered by the local limiter instead; after the next successful
+    Redis call the requests allowed meanwhile are charged to Redis.
+    """
+
+    def __init__(
+        self,
+        backend: RedisRateLimiter,
+        lease_ttl: float = 1.0,
+        maxsize: int = 100000,
+        fallback: Optional[LocalRateLimiter] = None,
+    ):
+        self.backend = backend
+        self.lease_ttl = lease_ttl
+        self.fallback = fallback
+        self._leases: TTLCache[Tuple[str, str], _Lease] = TTLCache(maxsize)
+        self._refills: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._reconcile: Optional[asyncio.Task] = None
+        self.local_hits = 0
+        self.local_denials = 0
+        self.redis_calls = 0
+        self.fallback_hits = 0
+
+    async def hit(
+        self, key: str, rate: Rate, lease_fraction: float = 0.0, bucket: str = ""
+    ) -> RateLimitResult:
+        chunk = int(rate.limit * lease_fraction)
+        if chunk <= 1:
+            self.redis_calls += 1
+            try:
+                result = await self.backend.hit(key, rate, bucket)
+            except BACKEND_ERRORS as e:
+                return self._fall_back(e, key, rate, bucket)
+            self._backend_ok()
+            return result
+
+        lease_key = (key, bucket)
+        while True:
+            now = time.monotonic()
+            lease = self._leases.get(lease_key)
+            if lease is not None and lease.expires_at > now:
+                if lease.tokens > 0:
+                    lease.tokens -= 1
+                    self.local_hits += 1
+                    return RateLimitResult(
+                        True, rate.limit, lease.tokens + lease.global_remaining,
+                        max(0.0, lease.reset_at - now), 0.0,
+                    )
+                if lease.retry_at > now:
+                    self.local_denials += 1
+                    return RateLimitResult(
+                        False, rate.limit, 0,
+                        max(0.0, lease.reset_at - now), lease.retry_at - now,
+                    )
+
+            refill = self._refills.get(lease_key)
+            if refill is None:
+                break
+            await refill
+
+        refund = 0
+        if lease is not None:
+            refund = lease.tokens
+            self._leases.pop(lease_key)
+
+        refill = asyncio.get_running_loop().create_future()
+        self._refills[lease_key] = refill
+        try:
+            self.redis_calls += 1
+            granted, result = await self.backend.lease(key, rate, chunk, refund, bucket)
+        except BACKEND_ERRORS as e:
+            return self._fall_back(e, key, rate, bucket)
+        finally:
+            del self._refills[lease_key]
+            refill.set_result(None)
+        self._backend_ok()
+
+        now = time.monotonic()
+        if granted == 0:
+            retry_at = now + result.retry_after
+            self._leases.set(lease_key, _Lease(
+                0, 0, now + result.reset_after, min(retry_at, now + self.lease_ttl), retry_at
+            ))
+            return result
+
+        self._leases.set(lease_key, _Lease(
+            granted - 1, result.remaining, now + result.reset_after, now + self.lease_ttl
+        ))
+        return RateLimitResult(
+            True, rate.limit, granted - 1 + result.remaining, result.reset_after, 0.0
+        )
+
+    def _fall_back(self, error: Exception, key: str, rate: Rate, bucket: str) -> RateLimitResult:
+        if self.fallback is None:
+            raise error
+        self.fallback_hits += 1
+        return self.fallback.hit(key, rate, bucket)
+
+    def _backend_ok(self) -> None:
+        if self.fallback is not None and self.fallback.spent and self._reconcile is None:
+            self._reconcile = asyncio.get_running_loop().create_task(self._charge_fallback())
+
+    async def _charge_fallback(self, chunk_size: int = 1000) -> None:
+        """Charge the requests the fallback allowed to the principals' Redis quotas"""
+        spent = list(self.fallback.drain().items())
+        try:
+            for start in range(0, len(spent), chunk_size):
+                await asyncio.gather(*[
+                    self.backend.lease(key, rate, count, bucket=bucket)
+                    for (key, bucket), (rate, count) in spent[start:start + chunk_size]
+                ])
+            logger.info(f"Redis is back: charged fallback usage of {len(spent)} buckets")
+        except BACKEND_ERRORS as e:
+            logger.warning(f"Could not charge fallback usage to Redis: {e!r}")
+        finally:
+            self._reconcile = None
+
+    async def reset(self, keys: Iterable[str]) -> int:
+        """
+        Drop the principals' counters in Redis. Tokens this or other workers
+        already leased stay spendable until their lease expires (lease_ttl).
+        """
+        return await self.backend.reset(keys)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leases": len(self._leases),
+            "local_hits": self.local_hits,
+            "local_denials": self.local_denials,
+            "redis_calls": self.redis_calls,
+            "fallback_hits": self.fallback_hits,
+        }
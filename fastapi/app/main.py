@@ -1,36 +1,62 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from contextlib import asynccontextmanager
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+import logging
 
 from app.api.v1.router import api_router
 from app.core.middleware import setup_middleware
+from app.core.security import PasswordHashPoolSaturated, password_hash_pool
 from app.config import settings
-from app.database import connect_database, disconnect_database
+from app.database import connect_database, db_router, disconnect_database, warm_up_database
+from app.health import health_monitor
+from app.ip_access import ip_access_lists
+from app.metrics import render_metrics
+from app.monitoring import rate_limit_monitor
+from app.rate_limiting import rate_limit_policy
 from app.redis_client import redis_manager
 
-# Create limiter instance
-limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri=settings.REDIS_URL,
-    default_limits=["1000/hour"]
-)
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    try:
+        await redis_manager.connect()
+    except Exception as e:
+        # Rate limiting fails open and /readyz reports it; keep starting
+        logger.warning(f"Redis unavailable at startup: {e}")
     await connect_database()
+    # Pay cold-connection costs before the worker starts taking traffic
+    await warm_up_database()
+    await db_router.start()
+    rate_limit_policy.load(app.routes)
+    await ip_access_lists.start()
+    # Last, so the first readiness result reflects a fully started worker
+    await health_monitor.start()
     yield
     # Shutdown
+    await health_monitor.stop()
     await disconnect_database()
+    await ip_access_lists.stop()
+    await rate_limit_monitor.close()
+    password_hash_pool.shutdown()
+    await redis_manager.close()
+
+async def password_hash_pool_saturated_handler(request: Request, exc: PasswordHashPoolSaturated):
+    """Shed load quickly instead of queueing more bcrypt work"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description=settings.PROJECT_DESCRIPTION,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse,
     lifespan=lifespan
 )
 
@@ -46,9 +72,8 @@ app.add_middleware(
 # Setup custom middleware
 setup_middleware(app)
 
-# Add slowapi rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Exception handlers
+app.add_exception_handler(PasswordHashPoolSaturated, password_hash_pool_saturated_handler)
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -57,6 +82,28 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def root():
     return {"message": "Welcome to FastAPI with Prisma!"}
 
+@app.get("/livez")
+async def liveness_probe():
+    """The process is up and serving; dependencies are not considered"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_probe():
+    """Cached dependency checks with per-dependency latency; 503 until ready"""
+    report = health_monitor.report()
+    return JSONResponse(status_code=200 if report["status"] == "ready" else 503, content=report)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    """Kept for existing clients; always 200, see /readyz for a gating probe"""
+    database = health_monitor.results.get("database")
+    return {
+        "status": "healthy" if health_monitor.is_ready() else "degraded",
+        "database": "connected" if database is not None and database.healthy else "disconnected",
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics, merged across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
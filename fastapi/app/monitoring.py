@@ -1,55 +1,302 @@
-from slowapi.util import get_remote_address
-from typing import Dict, List
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from collections import deque
+import asyncio
 import json
-from datetime import datetime, timedelta
+import logging
+import time
+import uuid
+from datetime import datetime
 
 from fastapi import Request
 
-from app.rate_limiting import get_endpoint_category, get_user_id_or_ip, get_user_type
-from app.redis_client import RedisManager
+from app.config import settings
+from app.metrics import observe_dependency_call
+from app.redis_client import RedisManager, redis_manager
+
+logger = logging.getLogger(__name__)
+
+class RateLimitHit(NamedTuple):
+    """A limited request, captured without any formatting on the request path"""
+    timestamp: float
+    user_key: str
+    user_type: str
+    endpoint_category: str
+    rate_limit: str
+    method: str
+    endpoint: str
+    ip_address: Optional[str]
+    raw_headers: List[Tuple[bytes, bytes]]
+
+    def to_entry(self) -> Dict:
+        user_agent = next(
+            (value.decode("latin-1") for name, value in self.raw_headers if name == b"user-agent"), ""
+        )
+        return {
+            "timestamp": datetime.utcfromtimestamp(self.timestamp).isoformat(),
+            "user_key": self.user_key,
+            "user_type": self.user_type,
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "endpoint_category": self.endpoint_category,
+            "rate_limit": self.rate_limit,
+            "ip_address": self.ip_address,
+            "user_agent": user_agent,
+        }
+
+class RateLimitHitLog:
+    """
+    Background writer for rate limit hits. Hits go into a bounded in-memory
+    queue (dropped and counted when full) and are drained in pipelined
+    batches: aggregates plus the recent-hits list or stream.
+    """
+
+    def __init__(
+        self,
+        monitor: "RateLimitMonitor",
+        key: str = "rate_limit_hits",
+        max_queue: int = settings.RATE_LIMIT_HIT_LOG_QUEUE_SIZE,
+        batch_size: int = settings.RATE_LIMIT_HIT_LOG_BATCH_SIZE,
+        flush_interval: float = settings.RATE_LIMIT_HIT_LOG_FLUSH_SECONDS,
+        max_entries: int = settings.RATE_LIMIT_HIT_LOG_MAX_ENTRIES,
+        use_stream: bool = settings.RATE_LIMIT_HIT_LOG_STREAM,
+    ):
+        self.monitor = monitor
+        self.key = key
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.use_stream = use_stream
+        self._queue: Deque[RateLimitHit] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def log(self, hit: RateLimitHit) -> bool:
+        """Queue a hit without awaiting; False if it was dropped"""
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self._queue.append(hit)
+        self._ensure_writer()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run(self._wakeup))
+
+    async def _run(self, wakeup: asyncio.Event):
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far"""
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                await self._write(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Failed to write {len(batch)} rate limit hits: {e}")
+
+    async def _write(self, batch: List[RateLimitHit]):
+        start = time.perf_counter()
+        try:
+            await self._write_batch(batch)
+        finally:
+            observe_dependency_call("redis", "hit_log", time.perf_counter() - start)
+
+    async def _write_batch(self, batch: List[RateLimitHit]):
+        entries = [json.dumps(hit.to_entry()) for hit in batch]
+        
+        async with self.monitor.redis_manager.pipeline() as pipe:
+            self.monitor.add_aggregates(
+                pipe, ((hit.timestamp, hit.user_key, hit.user_type, hit.endpoint_category, 1) for hit in batch)
+            )
+            if self.use_stream:
+                for entry in entries:
+                    pipe.xadd(self.key, {"entry": entry}, maxlen=self.max_entries, approximate=True)
+            else:
+                pipe.lpush(self.key, *entries)
+                pipe.ltrim(self.key, 0, self.max_entries - 1)
+            pipe.expire(self.key, 86400)  # Keep for 24 hours
+            await pipe.execute()
+
+    def read_recent(self, pipe, count: int):
+        """Queue a read of the ``count`` most recent entries on a pipeline"""
+        if self.use_stream:
+            pipe.xrevrange(self.key, count=count)
+        else:
+            pipe.lrange(self.key, 0, count - 1)
+
+    def parse_recent(self, raw) -> List[Dict]:
+        if self.use_stream:
+            return [json.loads(fields["entry"]) for _, fields in raw]
+        return [json.loads(entry) for entry in raw]
+
+    async def close(self):
+        """Stop the writer and flush what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
 
 class RateLimitMonitor:
-    """Monitor rate limiting metrics"""
+    """
+    Monitor rate limiting metrics.
+
+    Each limited request increments per-time-bucket aggregates (hashes by
+    user type and endpoint category, a sorted set by user key), so stats
+    are read in O(buckets) without walking the keyspace.
+    """
     
-    def __init__(self, redis_manager: RedisManager):
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        prefix: str = "rate_limit_stats",
+        bucket_seconds: int = settings.RATE_LIMIT_STATS_BUCKET_SECONDS,
+        retention_seconds: int = settings.RATE_LIMIT_STATS_RETENTION_SECONDS,
+        **hit_log_options,
+    ):
         self.redis_manager = redis_manager
+        self.prefix = prefix
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self.hits = RateLimitHitLog(self, **hit_log_options)
+    
+    def _bucket_keys(self, bucket: int) -> Tuple[str, str, str]:
+        base = f"{self.prefix}:{bucket}"
+        return f"{base}:user_type", f"{base}:endpoint", f"{base}:users"
+    
+    def _buckets(self, time_window: int, now: Optional[float] = None) -> List[int]:
+        current = int((now or time.time()) // self.bucket_seconds)
+        count = max(1, -(-min(time_window, self.retention_seconds) // self.bucket_seconds))
+        return list(range(current - count + 1, current + 1))
     
-    async def get_rate_limit_stats(self, time_window: int = 3600) -> Dict:
-        """Get rate limiting statistics"""
+    def add_aggregates(self, pipe, hits: Iterable[Tuple[float, str, str, str, int]]):
+        """Queue HINCRBY/ZINCRBY for (timestamp, user_key, user_type, category, count) hits, summed per bucket"""
+        totals: Dict[Tuple[int, int, str], int] = {}
+        for timestamp, user_key, user_type, category, count in hits:
+            bucket = int(timestamp // self.bucket_seconds)
+            for kind, field in ((0, user_type), (1, category), (2, user_key)):
+                totals[(bucket, kind, field)] = totals.get((bucket, kind, field), 0) + count
+        
+        touched = set()
+        for (bucket, kind, field), count in totals.items():
+            key = self._bucket_keys(bucket)[kind]
+            if kind == 2:
+                pipe.zincrby(key, count, field)
+            else:
+                pipe.hincrby(key, field, count)
+            touched.add(key)
+        for key in touched:
+            pipe.expire(key, self.retention_seconds + self.bucket_seconds)
+    
+    async def record_limited(self, user_key: str, user_type: str, category: str, count: int = 1):
+        """Add limited requests to the current bucket's aggregates (one round trip)"""
+        async with self.redis_manager.pipeline() as pipe:
+            self.add_aggregates(pipe, [(time.time(), user_key, user_type, category, count)])
+            await pipe.execute()
+    
+    async def count_keys(self, pattern: str, budget_seconds: float = settings.RATE_LIMIT_STATS_SCAN_BUDGET_SECONDS) -> Dict:
+        """Count keys with incremental SCAN, stopping when the time budget runs out"""
         redis_client = await self.redis_manager.get_async_client()
+        deadline = time.monotonic() + budget_seconds
+        cursor, total = 0, 0
+        while True:
+            cursor, keys = await redis_client.scan(cursor=cursor, match=pattern, count=1000)
+            total += len(keys)
+            if cursor == 0:
+                return {"count": total, "complete": True}
+            if time.monotonic() >= deadline:
+                return {"count": total, "complete": False}
+    
+    async def get_rate_limit_stats(self, time_window: int = 3600, top: int = 10) -> Dict:
+        """Get rate limiting statistics for the last ``time_window`` seconds"""
+        buckets = self._buckets(time_window)
+        user_keys = [self._bucket_keys(bucket)[2] for bucket in buckets]
+        top_key = f"{self.prefix}:top:{uuid.uuid4().hex}"
         
-        # Get all rate limit keys
-        keys = await redis_client.keys("rate_limit:*")
+        # MULTI/EXEC: the temporary union key is created and deleted atomically,
+        # so a failure or cancellation part way cannot leave it behind
+        async with self.redis_manager.pipeline(transaction=True) as pipe:
+            for bucket in buckets:
+                by_user_type, by_endpoint, _ = self._bucket_keys(bucket)
+                pipe.hgetall(by_user_type)
+                pipe.hgetall(by_endpoint)
+            pipe.zunionstore(top_key, user_keys)
+            pipe.expire(top_key, 60)
+            pipe.zrevrange(top_key, 0, top - 1, withscores=True)
+            pipe.delete(top_key)
+            self.hits.read_recent(pipe, 10)
+            results = await pipe.execute()
+        
+        by_user_type: Dict[str, int] = {}
+        by_endpoint: Dict[str, int] = {}
+        for index in range(len(buckets)):
+            for totals, counts in ((by_user_type, results[2 * index]), (by_endpoint, results[2 * index + 1])):
+                for field, value in counts.items():
+                    totals[field] = totals.get(field, 0) + int(value)
+        top_limited, recent = results[-3], results[-1]
         
         stats = {
-            "total_keys": len(keys),
-            "by_user_type": {},
-            "by_endpoint": {},
-            "top_limited_users": [],
-            "recent_limits": []
+            "time_window": time_window,
+            "total_keys": await self.count_keys("rate_limit:*"),
+            "total_limited": sum(by_user_type.values()),
+            "by_user_type": by_user_type,
+            "by_endpoint": by_endpoint,
+            "top_limited_users": [{"user_key": key, "count": int(score)} for key, score in top_limited],
+            "recent_limits": self.hits.parse_recent(recent),
+            "hit_log": self.hits.stats(),
         }
         
         return stats
     
-    async def log_rate_limit_hit(self, request: Request, rate_limit: str):
-        """Log rate limit hit for monitoring"""
-        redis_client = await self.redis_manager.get_async_client()
-        
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "user_key": get_user_id_or_ip(request),
-            "user_type": get_user_type(request),
-            "endpoint": request.url.path,
-            "method": request.method,
-            "endpoint_category": get_endpoint_category(request),
-            "rate_limit": rate_limit,
-            "ip_address": get_remote_address(request),
-            "user_agent": request.headers.get("user-agent", "")
-        }
-        
-        # Store in Redis with expiration
-        await redis_client.lpush("rate_limit_hits", json.dumps(log_entry))
-        await redis_client.expire("rate_limit_hits", 86400)  # Keep for 24 hours
-        
-        # Keep only last 1000 entries
-        await redis_client.ltrim("rate_limit_hits", 0, 999)
\ No newline at end of file
+    def log_rate_limit_hit(
+        self, request: Request, rate_limit: str, user_key: str, user_type: str, endpoint_category: str
+    ) -> bool:
+        """Queue a rate limit hit for background logging (never awaits I/O)"""
+        client = request.scope.get("client")
+        return self.hits.log(RateLimitHit(
+            time.time(),
+            user_key,
+            user_type,
+            endpoint_category,
+            rate_limit,
+            request.method,
+            request.scope.get("path", ""),
+            client[0] if client else None,
+            request.scope.get("headers", []),
+        ))
+    
+    async def close(self):
+        await self.hits.close()
+
+# Global monitor
+rate_limit_monitor = RateLimitMonitor(redis_manager)
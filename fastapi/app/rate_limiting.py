@@ -1,9 +1,139 @@
-from slowapi.util import get_remote_address
-from fastapi import Request
-from typing import Callable, Optional
-import re
+from fastapi import HTTPException, Request, Response, status
+from starlette.routing import BaseRoute
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Iterable, List, Mapping, Optional, Tuple
 
-from app.config import Settings
+from app.config import Settings, settings
+from app.ip_access import ip_access_lists
+from app.limiter import BACKEND_ERRORS, LeasedRateLimiter, LocalRateLimiter, Rate, RedisRateLimiter
+from app.monitoring import rate_limit_monitor
+from app.redis_client import redis_manager
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.ip_prefix import PrefixSet
+
+# Shared limiter engine: local leased buckets in front of Redis, which is
+# skipped while the breaker is open so a Redis brownout costs no latency;
+# meanwhile the in-memory fallback enforces this worker's share
+rate_limiter = LeasedRateLimiter(
+    RedisRateLimiter(
+        redis_manager,
+        breaker=CircuitBreaker(
+            "redis-rate-limit",
+            failure_threshold=settings.REDIS_BREAKER_FAILURES,
+            reset_timeout=settings.REDIS_BREAKER_RESET_SECONDS,
+            call_timeout=settings.REDIS_BREAKER_TIMEOUT_SECONDS,
+        ),
+    ),
+    lease_ttl=settings.RATE_LIMIT_LEASE_TTL_SECONDS,
+    fallback=(
+        LocalRateLimiter(workers=settings.RATE_LIMIT_FALLBACK_WORKERS)
+        if settings.RATE_LIMIT_FALLBACK_ENABLED else None
+    ),
+)
+
+def get_lease_fraction(category: str, config: Settings = settings) -> float:
+    """How much of the limit a worker may lease locally for this category"""
+    fractions = config.RATE_LIMIT_LEASE_FRACTIONS
+    return fractions.get(category, fractions.get("default", 0.0))
+
+async def enforce(
+    request: Request,
+    response: Response,
+    bucket: str,
+    limit: str,
+    rate: Rate,
+    lease_fraction: float,
+    category: str,
+) -> None:
+    """Spend one request from the caller's ``bucket``; 429 with headers when exhausted"""
+    user_key = get_user_id_or_ip(request)
+    try:
+        result = await rate_limiter.hit(user_key, rate, lease_fraction, bucket)
+    except BACKEND_ERRORS:
+        # Redis is down or slow and there is no fallback limiter (the
+        # breaker logs when the outage starts and ends)
+        if settings.RATE_LIMIT_FAIL_OPEN:
+            return
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rate limiting unavailable",
+            headers={"Retry-After": "1"},
+        )
+    if not result.allowed:
+        # Queued for the background writer: refusing stays free of I/O
+        rate_limit_monitor.log_rate_limit_hit(request, limit, user_key, get_user_type(request), category)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {limit}",
+            headers=result.headers(),
+        )
+    response.headers.update(result.headers())
+
+async def enforce_policy(request: Request, response: Response) -> None:
+    """
+    Enforce the IP deny/allow lists and the compiled policy for this
+    request. Buckets are per endpoint category, so e.g. all API writes of
+    one user share their limit.
+    """
+    client_ip = get_client_ip(request)
+    if client_ip in ip_access_lists.deny:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    if client_ip in ip_access_lists.allow:
+        return
+    
+    policy = rate_limit_policy.get(request).resolve(request)
+    if policy is None:
+        return
+    await enforce(
+        request, response, policy.category, policy.limit, policy.rate, policy.lease_fraction, policy.category
+    )
+
+def rate_limit(limit: str, scope: Optional[str] = None, category: Optional[str] = None) -> Callable:
+    """
+    Build a dependency enforcing a fixed ``limit`` (e.g. "10/hour") per user
+    or IP, for routes that need more than the policy. Counters are per
+    ``scope``, defaulting to the route's method and path; ``category``
+    (default: derived from the request) picks the lease fraction. Enforcement
+    goes through ``enforce`` like the policy; only the limit is fixed.
+    """
+    rate = Rate.parse(limit)
+
+    async def dependency(request: Request, response: Response) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        bucket = scope
+        if bucket is None:
+            route = request.scope.get("route")
+            bucket = f"{request.method}:{getattr(route, 'path', request.url.path)}"
+
+        endpoint_category = category or get_endpoint_category(request)
+        await enforce(
+            request,
+            response,
+            bucket,
+            limit,
+            rate,
+            get_lease_fraction(endpoint_category),
+            endpoint_category,
+        )
+
+    return dependency
+
+def get_client_ip(request: Request) -> str:
+    """Client IP address from the ASGI scope, 127.0.0.1 if unknown"""
+    client = request.scope.get("client")
+    return client[0] if client and client[0] else "127.0.0.1"
+
+def get_request_user(request: Request):
+    """
+    User stored in request state by the auth dependencies, else one set by
+    an authentication middleware. Reads the scope dicts directly: a missing
+    request.state attribute raises, and request.user asserts when no
+    authentication middleware is installed.
+    """
+    return request.scope.get("state", {}).get("user") or request.scope.get("user")
 
 def get_user_id_or_ip(request: Request) -> str:
     """
@@ -11,22 +141,16 @@ def get_user_id_or_ip(request: Request) -> str:
     This provides per-user rate limiting for authenticated users
     and per-IP for anonymous users
     """
-    # Try to get user from request state (set by auth middleware)
-    user = getattr(request.state, 'user', None)
+    user = get_request_user(request)
     if user and hasattr(user, 'id'):
         return f"user:{user.id}"
     
-    # Try to get user from dependency injection
-    if hasattr(request, 'user') and request.user:
-        return f"user:{request.user.id}"
-    
     # Fall back to IP address
-    ip_address = get_remote_address(request)
-    return f"ip:{ip_address}"
+    return f"ip:{get_client_ip(request)}"
 
 def get_user_type(request: Request) -> str:
     """Determine user type for different rate limits"""
-    user = getattr(request.state, 'user', None) or getattr(request, 'user', None)
+    user = get_request_user(request)
     
     if not user:
         return "anonymous"
@@ -41,13 +165,10 @@ def get_user_type(request: Request) -> str:
     # Default for authenticated users
     return "authenticated"
 
-def get_endpoint_category(request: Request) -> str:
-    """Categorize endpoint for different rate limits"""
-    path = request.url.path
-    method = request.method
-    
+def categorize_endpoint(path: str, method: str) -> str:
+    """Categorize an endpoint path (or route template) for different rate limits"""
     # Health check endpoints
-    if path in ["/health", "/", "/docs", "/redoc", "/openapi.json"]:
+    if path in ["/health", "/livez", "/readyz", "/", "/docs", "/redoc", "/openapi.json"]:
         return "health"
     
     # Authentication endpoints
@@ -67,30 +188,113 @@ def get_endpoint_category(request: Request) -> str:
     
     return "default"
 
-def is_whitelisted_ip(request: Request) -> bool:
-    """Check if IP is whitelisted"""
-    ip_address = get_remote_address(request)
-    return ip_address in Settings.RATE_LIMIT_WHITELIST
+def get_endpoint_category(request: Request) -> str:
+    """Categorize endpoint for different rate limits"""
+    return categorize_endpoint(request.url.path, request.method)
+
+# =========================
+# Compiled rate-limit policy
+# =========================
+
+USER_TYPES = ("anonymous", "authenticated", "premium")
+ENDPOINT_CATEGORIES = ("health", "auth_login", "auth_register", "auth", "api_read", "api_write", "default")
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    category: str
+    limit: str
+    rate: Rate
+    lease_fraction: float
+
+class RateLimitPolicy:
+    """
+    Immutable lookup table compiled from Settings: (route template, method)
+    -> user type -> pre-parsed limit, plus the whitelist as a prefix set.
+    Requests that match no route fall back to a per-category table.
+    """
+
+    __slots__ = ("enabled", "whitelist", "routes", "categories")
+
+    def __init__(
+        self,
+        enabled: bool,
+        whitelist: PrefixSet,
+        routes: Mapping[Tuple[str, str], Mapping[str, RoutePolicy]],
+        categories: Mapping[str, Mapping[str, RoutePolicy]],
+    ):
+        self.enabled = enabled
+        self.whitelist = whitelist
+        self.routes = routes
+        self.categories = categories
+
+    def resolve(self, request: Request) -> Optional[RoutePolicy]:
+        """Policy for this request, or None if it is not rate limited"""
+        if not self.enabled or get_client_ip(request) in self.whitelist:
+            return None
+        
+        by_user_type = None
+        route = request.scope.get("route")
+        if route is not None:
+            by_user_type = self.routes.get((route.path, request.method))
+        if by_user_type is None:
+            by_user_type = self.categories[get_endpoint_category(request)]
+        return by_user_type[get_user_type(request)]
 
-def get_rate_limit_for_request(request: Request) -> str:
-    """Get appropriate rate limit for the request"""
-    if not Settings.RATE_LIMIT_ENABLED:
-        return "10000/minute"  # Very high limit when disabled
+def resolve_limit(config: Settings, user_type: str, category: str) -> str:
+    """Pick the limit string for a user type and endpoint category"""
+    user_limits = config.USER_TYPE_RATE_LIMITS.get(user_type, {})
+    for candidate in (
+        user_limits.get(category),
+        config.RATE_LIMITS.get(category),
+        user_limits.get("default"),
+    ):
+        if candidate:
+            return candidate
+    return config.DEFAULT_RATE_LIMIT
+
+def compile_policy(routes: Iterable[BaseRoute], config: Settings = settings) -> RateLimitPolicy:
+    """Build the immutable policy table for the given routes"""
+    def build(category: str) -> Mapping[str, RoutePolicy]:
+        fraction = get_lease_fraction(category, config)
+        policies = {}
+        for user_type in USER_TYPES:
+            limit = resolve_limit(config, user_type, category)
+            policies[user_type] = RoutePolicy(category, limit, Rate.parse(limit), fraction)
+        return MappingProxyType(policies)
+    
+    categories = {category: build(category) for category in ENDPOINT_CATEGORIES}
+    table = {}
+    for route in routes:
+        path = getattr(route, "path", None)
+        for method in getattr(route, "methods", None) or ():
+            table[(path, method)] = categories[categorize_endpoint(path, method)]
     
-    if is_whitelisted_ip(request):
-        return "10000/minute"  # High limit for whitelisted IPs
+    return RateLimitPolicy(
+        enabled=config.RATE_LIMIT_ENABLED,
+        whitelist=PrefixSet(config.RATE_LIMIT_WHITELIST),
+        routes=MappingProxyType(table),
+        categories=MappingProxyType(categories),
+    )
+
+class RateLimitPolicyStore:
+    """Holds the current compiled policy; reloads swap it atomically"""
     
-    user_type = get_user_type(request)
-    endpoint_category = get_endpoint_category(request)
+    def __init__(self):
+        self._policy: Optional[RateLimitPolicy] = None
+        self._routes: List[BaseRoute] = []
     
-    # Get user-type specific limits first
-    user_limits = Settings.USER_TYPE_RATE_LIMITS.get(user_type, {})
-    if endpoint_category in user_limits:
-        return user_limits[endpoint_category]
+    def load(self, routes: Iterable[BaseRoute], config: Settings = settings) -> RateLimitPolicy:
+        self._routes = list(routes)
+        self._policy = compile_policy(self._routes, config)
+        return self._policy
     
-    # Fall back to general endpoint limits
-    if endpoint_category in Settings.RATE_LIMITS:
-        return Settings.RATE_LIMITS[endpoint_category]
+    def reload(self) -> RateLimitPolicy:
+        """Recompile from a fresh Settings (environment / .env) without a restart"""
+        return self.load(self._routes, Settings())
     
-    # Default limit
-    return Settings.DEFAULT_RATE_LIMIT
\ No newline at end of file
+    def get(self, request: Request) -> RateLimitPolicy:
+        if self._policy is None:
+            self.load(request.app.routes)
+        return self._policy
+
+rate_limit_policy = RateLimitPolicyStore()
@@ -1,6 +1,7 @@
 import redis.asyncio as redis
-import redis as sync_redis
-from typing import Optional
+from redis.asyncio.client import Pipeline
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 import logging
 
 from app.config import settings
@@ -8,61 +9,116 @@ from app.config import settings
 logger = logging.getLogger(__name__)
 
 class RedisManager:
-    """Redis connection manager for rate limiting"""
-    
-    def __init__(self, redis_url: str):
+    """
+    Owns the worker's single async Redis connection pool.
+
+    Every component shares one client on one ``ConnectionPool`` bounded by
+    ``max_connections``; idle connections are health-checked on checkout.
+    ``connect`` opens and warms the pool at startup; before that the client
+    is still created on first use, just without the up-front ping.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout: float = settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout: float = settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval: int = settings.REDIS_HEALTH_CHECK_INTERVAL,
+    ):
         self.redis_url = redis_url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.socket_connect_timeout = socket_connect_timeout
+        self.health_check_interval = health_check_interval
+        self._pool: Optional[redis.ConnectionPool] = None
         self._async_client: Optional[redis.Redis] = None
-        self._sync_client: Optional[sync_redis.Redis] = None
-    
+
+    def _create_client(self) -> redis.Redis:
+        self._pool = redis.ConnectionPool.from_url(
+            self.redis_url,
+            encoding="utf-8",
+            decode_responses=True,
+            retry_on_timeout=True,
+            max_connections=self.max_connections,
+            socket_connect_timeout=self.socket_connect_timeout,
+            socket_timeout=self.socket_timeout,
+            health_check_interval=self.health_check_interval,
+        )
+        return redis.Redis(connection_pool=self._pool)
+
+    async def connect(self, warmup_connections: int = settings.REDIS_WARMUP_CONNECTIONS) -> redis.Redis:
+        """Open the pool with ``warmup_connections`` live connections; raises if Redis is unreachable"""
+        client = await self.get_async_client()
+        # Checking connections out together forces distinct ones to be opened
+        connections = []
+        try:
+            for _ in range(max(1, warmup_connections)):
+                connections.append(await self._pool.get_connection())
+        finally:
+            for connection in connections:
+                await self._pool.release(connection)
+        logger.info(f"Redis pool connected ({len(connections)} connections warmed)")
+        return client
+
+    def create_subscriber(self) -> redis.Redis:
+        """
+        Separate client for one long-lived pub/sub subscription. It has no
+        socket timeout, since an idle subscription would otherwise time out
+        and be silently re-subscribed, losing messages published in between;
+        dead connections are found by health-check PINGs and TCP keepalive.
+        The caller closes it.
+        """
+        return redis.Redis.from_url(
+            self.redis_url,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=1,
+            socket_connect_timeout=self.socket_connect_timeout,
+            socket_timeout=None,
+            socket_keepalive=True,
+            health_check_interval=self.health_check_interval,
+        )
+
     async def get_async_client(self) -> redis.Redis:
-        """Get async Redis client"""
+        """Get the shared async Redis client"""
         if self._async_client is None:
-            try:
-                self._async_client = redis.from_url(
-                    self.redis_url,
-                    encoding="utf-8",
-                    decode_responses=True,
-                    retry_on_timeout=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5
-                )
-                # Test connection
-                await self._async_client.ping()
-                logger.info("Redis async client connected successfully")
-            except Exception as e:
-                logger.error(f"Failed to connect to Redis (async): {e}")
-                raise
-        
+            self._async_client = self._create_client()
         return self._async_client
-    
-    def get_sync_client(self) -> sync_redis.Redis:
-        """Get sync Redis client (for slowapi)"""
-        if self._sync_client is None:
-            try:
-                self._sync_client = sync_redis.from_url(
-                    self.redis_url,
-                    encoding="utf-8",
-                    decode_responses=True,
-                    retry_on_timeout=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5
-                )
-                # Test connection
-                self._sync_client.ping()
-                logger.info("Redis sync client connected successfully")
-            except Exception as e:
-                logger.error(f"Failed to connect to Redis (sync): {e}")
-                raise
-        
-        return self._sync_client
-    
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Pipeline]:
+        """
+        Pipeline on the shared pool: queue commands, then ``await pipe.execute()``
+        for one round trip (wrapped in MULTI/EXEC when ``transaction``)
+        """
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+    async def batch(self, build: Callable[[Pipeline], Any], transaction: bool = False) -> List[Any]:
+        """Queue commands with ``build(pipe)`` and send them in one round trip"""
+        async with self.pipeline(transaction=transaction) as pipe:
+            build(pipe)
+            return await pipe.execute()
+
+    def pool_stats(self) -> Dict[str, int]:
+        if self._pool is None:
+            return {"max_connections": self.max_connections, "created": 0, "in_use": 0}
+        in_use = len(self._pool._in_use_connections)
+        return {
+            "max_connections": self.max_connections,
+            "created": in_use + len(self._pool._available_connections),
+            "in_use": in_use,
+        }
+
     async def close(self):
-        """Close Redis connections"""
-        if self._async_client:
-            await self._async_client.close()
-        if self._sync_client:
-            self._sync_client.close()
+        """Close the client and every pooled connection"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            await self._pool.disconnect()
+            self._async_client = None
+            self._pool = None
 
 # Global Redis manager
-redis_manager = RedisManager(settings.REDIS_URL)
\ No newline at end of file
+redis_manager = RedisManager(settings.REDIS_URL)
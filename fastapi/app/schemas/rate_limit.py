@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List
+
+class RateLimitBulkReset(BaseModel):
+    # Keys as produced by get_user_id_or_ip, e.g. "user:42" or "ip:203.0.113.7"
+    user_keys: List[str]
+
+class RateLimitResetResponse(BaseModel):
+    message: str
+    requested: int
+    keys_deleted: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 # Base schemas
@@ -25,6 +25,29 @@ class UserInDB(UserBase):
 class UserResponse(UserInDB):
     pass
 
+# Bulk import
+class UserBulkRow(UserBase):
+    # Only needed for new users; existing users keep their password unless given
+    password: Optional[str] = None
+
+class UserBulkCreate(BaseModel):
+    # Rows are validated one by one so a bad row does not reject the batch
+    users: List[Dict[str, Any]]
+    update_existing: bool = False
+
+class UserBulkResult(BaseModel):
+    index: int
+    status: str  # "created", "updated" or "failed"
+    id: Optional[int] = None
+    email: Optional[str] = None
+    detail: Optional[str] = None
+
+class UserBulkResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[UserBulkResult]
+
 # For including related data
 class UserWithItems(UserResponse):
     items: List['ItemResponse'] = []
@@ -0,0 +1,104 @@
+from typing import Awaitable, Callable, Dict, TypeVar
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """The call was not attempted because the circuit is open"""
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is down or slow.
+
+    Closed: calls go through, each bounded by ``call_timeout``; a timeout or
+    error counts as a failure and ``failure_threshold`` failures in a row
+    open the circuit. Open: calls raise CircuitOpenError immediately for
+    ``reset_timeout`` seconds. Half-open: a single trial call is let through;
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, call_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._open = False
+        self._trial_running = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if not self._open:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def _acquire(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def reject_if_open(self) -> None:
+        """Raise CircuitOpenError while open, before any work is queued for ``call``"""
+        if self._open and self.state == self.OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def record_success(self) -> None:
+        if self._open:
+            logger.warning(f"Circuit {self.name} closed: calls succeed again")
+        self._open = False
+        self._trial_running = False
+        self.failures = 0
+
+    def record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        if self._trial_running or (not self._open and self.failures >= self.failure_threshold):
+            if not self._open:
+                self.times_opened += 1
+                logger.warning(
+                    f"Circuit {self.name} opened after {self.failures} failures "
+                    f"({error!r}); failing fast for {self.reset_timeout}s"
+                )
+            self._open = True
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args) -> T:
+        """Run ``func(*args)`` through the breaker"""
+        if not self._acquire():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = await asyncio.wait_for(func(*args), self.call_timeout)
+        except asyncio.CancelledError:
+            # Our caller was cancelled; that says nothing about the dependency
+            self._trial_running = False
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
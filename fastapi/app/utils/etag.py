@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+def _version(updated_at: datetime) -> int:
+    """updated_at as integer microseconds since the epoch"""
+    return round(updated_at.timestamp() * 1_000_000)
+
+def record_etag(record: Any) -> str:
+    """Weak ETag for one record from its id and updated_at"""
+    return f'W/"{record.id}-{_version(record.updated_at)}"'
+
+def page_etag(records: Sequence[Any]) -> str:
+    """
+    Weak ETag for a page of records ordered by id: row count, first and last
+    id and max(updated_at). Any create, update or delete that changes what
+    the page returns changes at least one of them.
+    """
+    if not records:
+        return 'W/"0"'
+    newest = max(_version(record.updated_at) for record in records)
+    return f'W/"{len(records)}-{records[0].id}-{records[-1].id}-{newest}"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match / If-Match header value lists ``etag`` (or is "*").
+    Uses weak comparison for both, since every ETag here is weak.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(candidate) == opaque for candidate in header.split(","))
@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+import csv
+import io
+import json
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _csv_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+def _row(record: Any, fields: Sequence[str]) -> Dict[str, Any]:
+    return {field: getattr(record, field) for field in fields}
+
+async def ndjson_stream(
+    batches: AsyncIterator[List[Any]], fields: Sequence[str]
+) -> AsyncIterator[str]:
+    """Serialize record batches as newline-delimited JSON, one chunk per batch"""
+    async for batch in batches:
+        yield "".join(
+            json.dumps(_row(record, fields), default=_default) + "\n" for record in batch
+        )
+
+async def csv_stream(
+    batches: AsyncIterator[List[Any]], fields: Sequence[str]
+) -> AsyncIterator[str]:
+    """Serialize record batches as CSV with a header row, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for record in batch:
+            writer.writerow([_csv_value(getattr(record, field)) for field in fields])
+        yield buffer.getvalue()
@@ -0,0 +1,91 @@
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple, Union
+import ipaddress
+import socket
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+def parse_ip(address: str) -> Optional[IPAddress]:
+    """Parse an address, folding IPv4-mapped IPv6 onto IPv4; None if invalid"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        return ip.ipv4_mapped
+    return ip
+
+_IPV4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+
+def _address_to_int(address: str) -> Optional[Tuple[int, int]]:
+    """(version, integer value) of a textual address; much cheaper than ipaddress"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+    except OSError:
+        pass
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, address)
+    except OSError:
+        return None
+    if packed[:12] == _IPV4_MAPPED_PREFIX:
+        return 4, int.from_bytes(packed[12:], "big")
+    return 6, int.from_bytes(packed, "big")
+
+class PrefixSet:
+    """
+    Immutable set of IP networks (plain addresses or CIDR ranges).
+
+    Networks are grouped by prefix length, so a lookup masks the address
+    once per distinct length present and does a set lookup - bounded by the
+    address' prefix length and usually a handful of probes.
+    """
+
+    __slots__ = ("_tables", "_networks")
+
+    def __init__(self, networks: Iterable[str] = ()):
+        by_length: Dict[int, Dict[int, Set[int]]] = {4: {}, 6: {}}
+        parsed = set()
+        for value in networks:
+            network = ipaddress.ip_network(value.strip(), strict=False)
+            if network.version == 6 and network.prefixlen >= 96:
+                mapped = network.network_address.ipv4_mapped
+                if mapped is not None:
+                    network = ipaddress.ip_network(f"{mapped}/{network.prefixlen - 96}")
+            parsed.add(network)
+            by_length[network.version].setdefault(network.prefixlen, set()).add(
+                int(network.network_address)
+            )
+
+        self._networks: FrozenSet[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]] = frozenset(parsed)
+        self._tables: Dict[int, Tuple[Tuple[int, FrozenSet[int]], ...]] = {
+            version: tuple(
+                (bits - length, frozenset(prefixes))
+                for length, prefixes in sorted(tables.items(), reverse=True)
+            )
+            for version, bits, tables in ((4, 32, by_length[4]), (6, 128, by_length[6]))
+        }
+
+    def __len__(self) -> int:
+        return len(self._networks)
+
+    def __iter__(self):
+        # Single addresses print without their /32 or /128
+        return iter(sorted(
+            str(network.network_address) if network.prefixlen == network.max_prefixlen else str(network)
+            for network in self._networks
+        ))
+
+    def __contains__(self, address: object) -> bool:
+        if isinstance(address, str):
+            parsed = _address_to_int(address)
+            if parsed is None:
+                return False
+            version, value = parsed
+        else:
+            address = parse_ip(str(address))
+            if address is None:
+                return False
+            version, value = address.version, int(address)
+        for shift, prefixes in self._tables[version]:
+            if (value >> shift) << shift in prefixes:
+                return True
+        return False
@@ -0,0 +1,33 @@
+from operator import attrgetter
+from typing import Any, Sequence, Type
+import orjson
+from pydantic import BaseModel
+
+# Aware UTC datetimes end in "Z" and naive ones stay naive, as pydantic writes them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=ORJSON_OPTIONS)
+
+class RowSerializer:
+    """
+    Serializes ORM rows (e.g. Prisma models) to the JSON a response schema
+    would produce, reading the schema's fields straight off each row with
+    no Pydantic instance per row. Rows are trusted to already hold valid
+    values, so flat schemas without aliases or custom serializers only.
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.fields = tuple(schema.model_fields)
+        getter = attrgetter(*self.fields)
+        self._values = getter if len(self.fields) > 1 else (lambda row: (getter(row),))
+
+    def row(self, row: Any) -> dict:
+        return dict(zip(self.fields, self._values(row)))
+
+    def one(self, row: Any) -> bytes:
+        return dumps(self.row(row))
+
+    def many(self, rows: Sequence[Any]) -> bytes:
+        fields, values = self.fields, self._values
+        return dumps([dict(zip(fields, values(row))) for row in rows])
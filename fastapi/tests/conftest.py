@@ -2,14 +2,37 @@ import pytest
 import pytest_asyncio
 import asyncio
 import os
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 from httpx import AsyncClient, ASGITransport
 from prisma import Prisma
 
+from app.config import settings
 from app.main import app
+from app.redis_client import RedisManager
 
 # Use the same PostgreSQL database for tests (you could create a separate test database)
 TEST_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Redis tests flush their database, so keep them off the app's (DB 0 by default)
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL") or urlsplit(settings.REDIS_URL)._replace(path="/15").geturl()
+
+def make_user(**overrides):
+    """A complete in-memory prisma User for tests that do not need the database"""
+    from prisma.models import User
+    
+    fields = {
+        "id": 1,
+        "email": "user@example.com",
+        "name": "Test User",
+        "password": "x",
+        "is_active": True,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "updated_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }
+    fields.update(overrides)
+    return User(**fields)
+
 @pytest.fixture(scope="session")
 def event_loop():
     policy = asyncio.get_event_loop_policy()
@@ -39,6 +62,9 @@ async def test_db():
 async def client(test_db):
     # Override the get_db dependency for testing
     from app.database import get_db
+    from app.core.principal_cache import principal_cache
+    from app.core.response_cache import response_cache
+    from app.core.security import claims_cache
     
     async def override_get_db():
         return test_db
@@ -50,6 +76,9 @@ async def client(test_db):
     
     # Clean up
     app.dependency_overrides.clear()
+    principal_cache.clear()
+    claims_cache.clear()
+    response_cache.clear()
 
 @pytest_asyncio.fixture
 async def test_user(test_db):
@@ -72,4 +101,18 @@ async def auth_headers(test_user):
     from app.core.security import create_access_token
     
     access_token = create_access_token(subject=test_user.id)
-    return {"Authorization": f"Bearer {access_token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {access_token}"}
+
+@pytest_asyncio.fixture
+async def test_redis():
+    """RedisManager on a clean local Redis test DB; skips the test if none is running"""
+    manager = RedisManager(TEST_REDIS_URL)
+    try:
+        client = await manager.connect(warmup_connections=1)
+    except Exception:
+        await manager.close()
+        pytest.skip("Redis is not available")
+    await client.flushdb()
+    yield manager
+    await client.flushdb()
+    await manager.close()
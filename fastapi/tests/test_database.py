@@ -0,0 +1,160 @@
+import pytest
+import asyncio
+
+from app.config import Settings
+from app.database import build_database_url, warm_up_database
+
+class TestDatabasePool:
+    """Test Prisma pool settings and startup warm-up."""
+
+    @pytest.mark.unit
+    def test_pool_settings_become_url_parameters(self):
+        config = Settings(DB_CONNECTION_LIMIT=20, DB_POOL_TIMEOUT=5, DB_PGBOUNCER=True)
+        url = build_database_url("postgresql://app:secret@db:5432/app?schema=public", config)
+
+        assert url == (
+            "postgresql://app:secret@db:5432/app"
+            "?schema=public&connection_limit=20&pool_timeout=5&pgbouncer=true"
+        )
+        # Nothing configured: the URL is left exactly as written
+        assert build_database_url("postgresql://app:p@ss@db/app", Settings()) == "postgresql://app:p@ss@db/app"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_warm_up_runs_queries_concurrently(self):
+        class FakeClient:
+            running = peak = 0
+
+            async def query_raw(self, query):
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+                await asyncio.sleep(0.01)
+                self.running -= 1
+
+        client = FakeClient()
+        await warm_up_database(4, "SELECT 1", client=client)
+        assert client.peak == 4
+
+class FakeDatabase:
+    """Stand-in for a Prisma client: counts queries and can be taken down"""
+
+    def __init__(self, name: str, connect_seconds: float = 0):
+        self.name = name
+        self.outstanding = 0
+        self.up = True
+        self.connected = False
+        self.connect_seconds = connect_seconds
+
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_seconds)
+        if not self.up:
+            raise ConnectionError(f"{self.name} is down")
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def query_raw(self, query):
+        if not self.up:
+            raise ConnectionError(f"{self.name} is down")
+
+class TestReplicaRouter:
+    """Test read-replica routing with stand-in databases."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_least_outstanding_then_round_robin(self):
+        from app.database import ReplicaRouter
+
+        primary, a, b = FakeDatabase("primary"), FakeDatabase("a"), FakeDatabase("b")
+        router = ReplicaRouter(primary, [a, b])
+
+        # Equal load alternates between replicas
+        assert [(await router.for_read()).name for _ in range(4)] == ["a", "b", "a", "b"]
+
+        a.outstanding = 3
+        assert [(await router.for_read()).name for _ in range(3)] == ["b", "b", "b"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unhealthy_replicas_are_skipped(self):
+        from app.database import ReplicaRouter
+
+        primary, a, b = FakeDatabase("primary"), FakeDatabase("a"), FakeDatabase("b")
+        router = ReplicaRouter(primary, [a, b])
+        await router.connect()
+
+        a.up = False
+        assert await router.check_health() == [False, True]
+        assert {(await router.for_read()).name for _ in range(4)} == {"b"}
+
+        b.up = False
+        await router.check_health()
+        assert (await router.for_read()).name == "primary"
+
+        a.up = True
+        await router.check_health()
+        assert (await router.for_read()).name == "a"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_slow_connect_is_not_a_failed_probe(self):
+        from app.database import ReplicaRouter
+
+        cold = FakeDatabase("cold", connect_seconds=0.05)
+        router = ReplicaRouter(FakeDatabase("primary"), [cold], health_check_timeout=0.01)
+        assert await router.check_health() == [True]
+
+    @pytest.mark.rate_limiting
+    @pytest.mark.asyncio
+    async def test_writes_are_seen_by_other_workers(self, test_redis):
+        from app.database import ReplicaRouter
+
+        primary, replica = FakeDatabase("primary"), FakeDatabase("replica")
+        worker_a = ReplicaRouter(primary, [replica], sticky_seconds=0.2, redis_manager=test_redis)
+        worker_b = ReplicaRouter(primary, [replica], sticky_seconds=0.2, redis_manager=test_redis)
+
+        await worker_a.record_write("user:1")
+        assert (await worker_b.for_read("user:1")).name == "primary"
+        assert (await worker_b.for_read("user:2")).name == "replica"
+
+        await asyncio.sleep(0.25)
+        assert (await worker_b.for_read("user:1")).name == "replica"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reads_follow_writes_to_the_primary(self, monkeypatch):
+        from fastapi import Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import database, dependencies
+        from app.database import ReplicaRouter, get_db
+        from app.dependencies import get_read_db
+
+        primary, replica = FakeDatabase("primary"), FakeDatabase("replica")
+        router = ReplicaRouter(primary, [replica], sticky_seconds=60)
+        monkeypatch.setattr(database, "db_router", router)
+        monkeypatch.setattr(dependencies, "db_router", router)
+        monkeypatch.setattr(database, "prisma", primary)
+        app = FastAPI()
+
+        @app.get("/things")
+        async def read(db=Depends(get_read_db)):
+            return db.name
+
+        @app.post("/things")
+        async def write(db=Depends(get_db)):
+            return db.name
+
+        async def call(method, client_ip):
+            transport = ASGITransport(app=app, client=(client_ip, 4000))
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                return (await client.request(method, "/things")).json()
+
+        assert await call("GET", "192.0.2.1") == "replica"
+        assert await call("POST", "192.0.2.1") == "primary"
+        assert await call("GET", "192.0.2.1") == "primary"
+        # Other principals are unaffected
+        assert await call("GET", "192.0.2.2") == "replica"
@@ -0,0 +1,41 @@
+import pytest
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.utils.export import csv_stream, ndjson_stream
+
+FIELDS = ("id", "email", "updated_at")
+
+async def fake_batches():
+    stamp = datetime(2024, 1, 1, 12, 0, 0)
+    yield [SimpleNamespace(id=1, email="a@example.com", updated_at=stamp, password="x")]
+    yield [
+        SimpleNamespace(id=2, email="b@example.com", updated_at=stamp, password="x"),
+        SimpleNamespace(id=3, email="c,d@example.com", updated_at=stamp, password="x"),
+    ]
+
+class TestExportStreams:
+    """Test bulk export serializers."""
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_ndjson_one_chunk_per_batch(self):
+        chunks = [chunk async for chunk in ndjson_stream(fake_batches(), FIELDS)]
+        assert len(chunks) == 2
+        
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        assert [row["id"] for row in rows] == [1, 2, 3]
+        assert rows[0]["updated_at"] == "2024-01-01T12:00:00"
+        assert all("password" not in row for row in rows)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_csv_header_and_quoting(self):
+        chunks = [chunk async for chunk in csv_stream(fake_batches(), FIELDS)]
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        
+        assert rows[0] == list(FIELDS)
+        assert rows[3] == ["3", "c,d@example.com", "2024-01-01T12:00:00"]
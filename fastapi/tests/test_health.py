@@ -0,0 +1,88 @@
+import pytest
+import asyncio
+from httpx import ASGITransport, AsyncClient
+
+from app.health import HealthMonitor
+
+def make_monitor(**checks):
+    return HealthMonitor(checks, required=["database", "redis"], timeout=0.05, stale_after=60)
+
+async def ok():
+    pass
+
+async def down():
+    raise ConnectionError("connection refused")
+
+async def hangs():
+    await asyncio.sleep(1)
+
+class TestHealthMonitor:
+    """Test cached dependency checks behind the health probes."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_ready_only_when_required_checks_pass(self):
+        monitor = make_monitor(database=ok, redis=ok)
+        assert not monitor.is_ready()  # nothing checked yet
+
+        await monitor.run_checks()
+        assert monitor.is_ready()
+        assert monitor.report()["checks"]["database"]["status"] == "pass"
+
+        monitor.checks["redis"] = hangs
+        await monitor.run_checks()
+        assert not monitor.is_ready()
+        assert monitor.report()["checks"]["redis"]["error"] == "timed out after 0.05s"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_optional_checks_are_only_reported(self):
+        monitor = HealthMonitor({"database": ok, "redis": down}, required=["database"])
+        await monitor.run_checks()
+
+        report = monitor.report()
+        assert report["status"] == "ready"
+        assert report["checks"]["redis"] == {
+            "status": "fail",
+            "latency_ms": report["checks"]["redis"]["latency_ms"],
+            "age_seconds": report["checks"]["redis"]["age_seconds"],
+            "required": False,
+            "error": "connection refused",
+        }
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stale_results_fail(self):
+        monitor = make_monitor(database=ok, redis=ok)
+        await monitor.run_checks()
+        monitor.stale_after = 0
+        await asyncio.sleep(0.001)
+        assert not monitor.is_ready()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_probe_endpoints(self, monkeypatch):
+        from app import main
+
+        calls = []
+
+        async def counted():
+            calls.append(1)
+
+        monitor = make_monitor(database=counted, redis=down)
+        monkeypatch.setattr(main, "health_monitor", monitor)
+        await monitor.run_checks()
+
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            assert (await client.get("/livez")).status_code == 200
+            response = await client.get("/readyz")
+            assert response.status_code == 503
+            assert response.json()["checks"]["redis"]["status"] == "fail"
+
+            monitor.checks["redis"] = ok
+            await monitor.run_checks()
+            assert (await client.get("/readyz")).status_code == 200
+            assert (await client.get("/health")).json() == {"status": "healthy", "database": "connected"}
+
+        # Probes never ran a check themselves
+        assert len(calls) == 2
@@ -0,0 +1,115 @@
+import pytest
+import asyncio
+import time
+
+from app.ip_access import IPAccessLists
+
+async def wait_until(condition, timeout=1.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        await asyncio.sleep(0.005)
+
+@pytest.mark.rate_limiting
+class TestIPAccessLists:
+    """Test Redis-backed IP allow/deny lists."""
+
+    @pytest.mark.asyncio
+    async def test_add_and_remove(self, test_redis):
+        lists = IPAccessLists(test_redis)
+
+        assert await lists.add("allow", "10.1.2.3/16")
+        assert not await lists.add("allow", "10.1.0.0/16")
+        assert await lists.add("deny", "2001:db8::1")
+        assert lists.entries() == {"allow": ["10.1.0.0/16"], "deny": ["2001:db8::1"]}
+        assert "10.1.200.7" in lists.allow
+        assert "10.2.0.1" not in lists.allow
+
+        assert await lists.remove("allow", "10.1.0.0/16")
+        assert "10.1.200.7" not in lists.allow
+
+        with pytest.raises(ValueError):
+            await lists.add("allow", "not-an-ip")
+        with pytest.raises(ValueError):
+            await lists.add("maybe", "10.0.0.1")
+
+    @pytest.mark.asyncio
+    async def test_start_loads_before_returning(self, test_redis):
+        await IPAccessLists(test_redis).add("deny", "203.0.113.0/24")
+        lists = IPAccessLists(test_redis)
+        await lists.start()
+        try:
+            assert "203.0.113.5" in lists.deny
+        finally:
+            await lists.stop()
+
+    @pytest.mark.asyncio
+    async def test_changes_reach_other_workers(self, test_redis):
+        worker_a, worker_b = IPAccessLists(test_redis), IPAccessLists(test_redis)
+        await worker_b.start()
+        try:
+            await asyncio.sleep(0.05)  # let the listener subscribe
+
+            start = time.perf_counter()
+            await worker_a.add("deny", "198.51.100.0/24")
+            while "198.51.100.9" not in worker_b.deny:
+                assert time.perf_counter() - start < 1
+                await asyncio.sleep(0.001)
+            print(f"propagated in {(time.perf_counter() - start) * 1000:.1f}ms")
+        finally:
+            await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_listener_survives_idle_and_reconnects(self, test_redis):
+        from app.redis_client import RedisManager
+        
+        # A pool socket timeout shorter than the idle period must not drop changes
+        manager = RedisManager(test_redis.redis_url, socket_timeout=0.1, health_check_interval=1)
+        lists = IPAccessLists(manager)
+        await lists.start()
+        try:
+            await asyncio.sleep(0.3)
+            await IPAccessLists(test_redis).add("deny", "198.51.100.0/24")
+            await wait_until(lambda: "198.51.100.9" in lists.deny)
+            
+            # Changed while the subscription is down: picked up on resubscribe
+            redis_client = await test_redis.get_async_client()
+            await redis_client.client_kill_filter(_type="pubsub")
+            await redis_client.sadd("ip_access:deny", "192.0.2.0/24")
+            await wait_until(lambda: "192.0.2.1" in lists.deny, timeout=3)
+        finally:
+            await lists.stop()
+            await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_enforced_by_rate_limit_dependency(self, test_redis, monkeypatch):
+        from fastapi import Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import rate_limiting
+        from app.limiter import LeasedRateLimiter, RedisRateLimiter
+
+        lists = IPAccessLists(test_redis)
+        monkeypatch.setattr(rate_limiting, "ip_access_lists", lists)
+        monkeypatch.setattr(rate_limiting, "rate_limit_policy", rate_limiting.RateLimitPolicyStore())
+        monkeypatch.setattr(
+            rate_limiting, "rate_limiter", LeasedRateLimiter(RedisRateLimiter(test_redis))
+        )
+        app = FastAPI()
+
+        @app.get("/api/v1/things", dependencies=[Depends(rate_limiting.enforce_policy)])
+        async def things():
+            return {}
+
+        async def get(client_ip):
+            transport = ASGITransport(app=app, client=(client_ip, 4000))
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/api/v1/things")
+
+        await lists.add("deny", "203.0.113.0/24")
+        await lists.add("allow", "198.51.100.7")
+
+        assert (await get("203.0.113.9")).status_code == 403
+        allowed = await get("198.51.100.7")
+        assert allowed.status_code == 200
+        assert "X-RateLimit-Limit" not in allowed.headers
+        assert "X-RateLimit-Limit" in (await get("192.0.2.1")).headers
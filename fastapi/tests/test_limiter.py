@@ -0,0 +1,429 @@
+import pytest
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+
+from app.limiter import LeasedRateLimiter, LocalRateLimiter, Rate, RateLimitResult, RedisRateLimiter
+
+class TestRate:
+    """Test rate limit string parsing."""
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value,limit,period", [
+        ("100/minute", 100, 60),
+        ("5000/hour", 5000, 3600),
+        ("10 per second", 10, 1),
+        ("10/2 hours", 10, 7200),
+    ])
+    def test_parse(self, value, limit, period):
+        rate = Rate.parse(value)
+        assert (rate.limit, rate.period) == (limit, period)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value", ["", "ten/hour", "10/fortnight"])
+    def test_parse_invalid(self, value):
+        with pytest.raises(ValueError):
+            Rate.parse(value)
+
+    @pytest.mark.unit
+    def test_result_headers(self):
+        headers = RateLimitResult(False, 10, 0, 359.2, 3.1).headers()
+        assert headers == {
+            "X-RateLimit-Limit": "10",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": "360",
+            "Retry-After": "4",
+        }
+
+@pytest.mark.rate_limiting
+class TestRedisRateLimiter:
+    """Test the Lua GCRA limiter against a local Redis."""
+    
+    @pytest.mark.asyncio
+    async def test_allows_up_to_limit(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("5/minute")
+        
+        results = [await limiter.hit("client", rate) for _ in range(6)]
+        
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+        assert 11 < results[-1].retry_after <= 12
+
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("1/minute")
+        
+        assert (await limiter.hit("a", rate)).allowed
+        assert not (await limiter.hit("a", rate)).allowed
+        assert (await limiter.hit("b", rate)).allowed
+
+    @pytest.mark.asyncio
+    async def test_buckets_share_one_key_per_principal(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        short, long = Rate.parse("1/minute"), Rate.parse("1/hour")
+        
+        assert (await limiter.hit("user:1", short, "api_read")).allowed
+        assert (await limiter.hit("user:1", long, "api_write")).allowed
+        assert not (await limiter.hit("user:1", short, "api_read")).allowed
+        assert (await limiter.hit("user:2", short, "api_read")).allowed
+        
+        client = await test_redis.get_async_client()
+        assert sorted(await client.keys("*")) == ["rate_limit:{user:1}", "rate_limit:{user:2}"]
+        assert sorted(await client.hkeys("rate_limit:{user:1}")) == ["api_read", "api_write"]
+        # Expires with the longest-lived bucket
+        assert 3590 < await client.ttl("rate_limit:{user:1}") <= 3600
+
+    @pytest.mark.asyncio
+    async def test_reset_principals(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("1/hour")
+        
+        await asyncio.gather(*[limiter.hit(f"ip:10.0.{i // 256}.{i % 256}", rate, "api_read") for i in range(2500)])
+        assert not (await limiter.hit("ip:10.0.0.1", rate, "api_read")).allowed
+        
+        deleted = await limiter.reset([f"ip:10.0.{i // 256}.{i % 256}" for i in range(2500)] + ["ip:10.9.9.9"])
+        assert deleted == 2500
+        assert (await limiter.hit("ip:10.0.0.1", rate, "api_read")).allowed
+        client = await test_redis.get_async_client()
+        assert await client.dbsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_hits_are_atomic(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("50/hour")
+        
+        results = await asyncio.gather(*[limiter.hit("burst", rate) for _ in range(200)])
+        assert sum(r.allowed for r in results) == 50
+
+    @pytest.mark.asyncio
+    async def test_recovers_from_script_flush(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("10/minute")
+        
+        assert (await limiter.hit("client", rate)).allowed
+        client = await test_redis.get_async_client()
+        await client.script_flush()
+        
+        results = await asyncio.gather(*[limiter.hit("client", rate) for _ in range(3)])
+        assert all(r.allowed for r in results)
+        assert results[-1].remaining == 6
+
+@pytest.mark.rate_limiting
+class TestRateLimitDependency:
+    """Test the rate_limit dependency on a minimal app."""
+    
+    @pytest.mark.asyncio
+    async def test_headers_and_429(self, test_redis, monkeypatch):
+        from fastapi import Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import rate_limiting
+        
+        monkeypatch.setattr(
+            rate_limiting, "rate_limiter", LeasedRateLimiter(RedisRateLimiter(test_redis))
+        )
+        app = FastAPI()
+        
+        @app.get("/limited", dependencies=[Depends(rate_limiting.rate_limit("2/minute"))])
+        async def limited():
+            return {"ok": True}
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.get("/limited")
+            second = await client.get("/limited")
+            third = await client.get("/limited")
+        
+        assert first.status_code == second.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "2"
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+        assert second.headers["X-RateLimit-Remaining"] == "0"
+        assert third.status_code == 429
+        assert int(third.headers["Retry-After"]) > 0
+
+    @pytest.mark.asyncio
+    async def test_policy_keys_by_user_and_type(self, test_redis, monkeypatch):
+        from types import SimpleNamespace
+        from fastapi import APIRouter, Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import dependencies, rate_limiting
+        from app.database import get_db
+        
+        monkeypatch.setattr(
+            rate_limiting, "rate_limiter", LeasedRateLimiter(RedisRateLimiter(test_redis))
+        )
+        monkeypatch.setattr(rate_limiting, "rate_limit_policy", rate_limiting.RateLimitPolicyStore())
+        verified = []
+        
+        async def fake_verify_token(token, db):
+            verified.append(token)
+            return SimpleNamespace(id=int(token), role="premium" if token == "1" else "user", is_active=True)
+        
+        monkeypatch.setattr(dependencies, "verify_token", fake_verify_token)
+        app = FastAPI()
+        router = APIRouter(dependencies=[Depends(dependencies.enforce_rate_limit)])
+        
+        @router.get("/api/v1/things")
+        async def things(user=Depends(dependencies.get_current_user)):
+            return {"id": user.id}
+        
+        @router.get("/api/v1/public")
+        async def public():
+            return {}
+        
+        app.include_router(router)
+        app.dependency_overrides[get_db] = lambda: None
+        
+        transport = ASGITransport(app=app, client=("203.0.113.9", 4000))
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            premium = await client.get("/api/v1/things", headers={"Authorization": "Bearer 1"})
+            regular = await client.get("/api/v1/things", headers={"Authorization": "Bearer 2"})
+            anonymous = await client.get("/api/v1/public")
+        
+        # Auth resolved once per request, shared by the limiter and the endpoint
+        assert verified == ["1", "2"]
+        assert premium.status_code == regular.status_code == anonymous.status_code == 200
+        # Same IP, but separate per-user buckets with per-type limits
+        assert premium.headers["X-RateLimit-Limit"] == "50000"
+        assert regular.headers["X-RateLimit-Limit"] == "5000"
+        assert regular.headers["X-RateLimit-Remaining"] == "4999"
+        assert anonymous.headers["X-RateLimit-Limit"] == "100"
+
+@pytest.mark.rate_limiting
+class TestLeasedRateLimiter:
+    """Test the local leased token-bucket tier."""
+    
+    @pytest.mark.asyncio
+    async def test_lease_grants_partial_chunk(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("10/minute")
+        
+        granted, result = await limiter.lease("client", rate, 8)
+        assert (granted, result.remaining) == (8, 2)
+        granted, result = await limiter.lease("client", rate, 8)
+        assert (granted, result.remaining) == (2, 0)
+        granted, result = await limiter.lease("client", rate, 8)
+        assert granted == 0 and not result.allowed
+
+    @pytest.mark.asyncio
+    async def test_refund_returns_tokens(self, test_redis):
+        limiter = RedisRateLimiter(test_redis)
+        rate = Rate.parse("10/minute")
+        
+        await limiter.lease("client", rate, 10)
+        granted, result = await limiter.lease("client", rate, 1, refund=4)
+        assert granted == 1
+        assert result.remaining == 3
+
+    @pytest.mark.asyncio
+    async def test_spends_lease_locally(self, test_redis):
+        limiter = LeasedRateLimiter(RedisRateLimiter(test_redis), lease_ttl=60)
+        rate = Rate.parse("100/minute")
+        
+        results = [await limiter.hit("client", rate, lease_fraction=0.1) for _ in range(25)]
+        
+        assert all(r.allowed for r in results)
+        assert limiter.redis_calls == 3
+        assert limiter.local_hits == 22
+        assert results[-1].remaining == 75
+
+    @pytest.mark.asyncio
+    async def test_zero_fraction_is_exact(self, test_redis):
+        limiter = LeasedRateLimiter(RedisRateLimiter(test_redis))
+        rate = Rate.parse("5/minute")
+        
+        results = [await limiter.hit("client", rate, lease_fraction=0) for _ in range(6)]
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert limiter.local_hits == 0
+
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_multi_worker_overshoot(self, test_redis):
+        """Measure how far leasing workers overshoot a shared limit."""
+        rate = Rate.parse("200/second")
+        workers_count = 4
+        duration = 2.0
+        
+        async def run(fraction):
+            client = await test_redis.get_async_client()
+            await client.flushdb()
+            # One limiter (and one Redis pipeline) per simulated worker
+            workers = [
+                LeasedRateLimiter(RedisRateLimiter(test_redis), lease_ttl=0.25)
+                for _ in range(workers_count)
+            ]
+            admitted = 0
+            deadline = asyncio.get_running_loop().time() + duration
+            
+            async def drive(limiter):
+                nonlocal admitted
+                while asyncio.get_running_loop().time() < deadline:
+                    if (await limiter.hit("shared", rate, fraction)).allowed:
+                        admitted += 1
+                    await asyncio.sleep(0)
+            
+            await asyncio.gather(*[drive(w) for w in workers])
+            redis_calls = sum(w.redis_calls for w in workers)
+            return admitted, redis_calls
+        
+        exact, exact_calls = await run(0.0)
+        leased, leased_calls = await run(0.1)
+        chunk = int(rate.limit * 0.1)
+        overshoot = leased - exact
+        print(
+            f"exact: {exact} admitted / {exact_calls} Redis calls, "
+            f"leased: {leased} admitted / {leased_calls} Redis calls, "
+            f"overshoot {overshoot} ({overshoot / rate.limit:.1%} of limit)"
+        )
+        
+        # Unspent leases are the only source of overshoot
+        assert overshoot <= workers_count * chunk
+        assert leased_calls < exact_calls
+
+@pytest.mark.rate_limiting
+class TestFallbackRateLimiter:
+    """Test the in-memory limiter used while Redis is unreachable."""
+    
+    @pytest.mark.unit
+    def test_limits_are_split_across_workers(self):
+        limiter = LocalRateLimiter(workers=4)
+        rate = Rate.parse("20/minute")
+        
+        results = [limiter.hit("client", rate) for _ in range(6)]
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert results[0].limit == 5
+        assert results[-1].retry_after > 0
+        assert limiter.drain() == {("client", ""): (rate, 5)}
+        # Draining starts a fresh window
+        assert limiter.hit("client", rate).allowed
+    
+    @pytest.mark.unit
+    def test_spent_is_bounded(self):
+        limiter = LocalRateLimiter(maxsize=3)
+        rate = Rate.parse("20/minute")
+        
+        for client in ["a", "b", "c", "a", "d"]:
+            assert limiter.hit(client, rate).allowed
+        # "b" was used least recently
+        assert limiter.drain() == {
+            ("c", ""): (rate, 1), ("a", ""): (rate, 2), ("d", ""): (rate, 1),
+        }
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_falls_back_and_charges_redis_on_recovery(self):
+        class FlakyBackend:
+            down = True
+            charged = []
+            
+            async def hit(self, key, rate, bucket=""):
+                return (await self.lease(key, rate, 1, bucket=bucket))[1]
+            
+            async def lease(self, key, rate, tokens, refund=0, bucket=""):
+                if self.down:
+                    raise ConnectionError("Redis is down")
+                self.charged.append((key, bucket, tokens))
+                return tokens, RateLimitResult(True, rate.limit, rate.limit - tokens, 1.0, 0.0)
+        
+        backend = FlakyBackend()
+        limiter = LeasedRateLimiter(backend, fallback=LocalRateLimiter(workers=2))
+        rate = Rate.parse("10/minute")
+        
+        results = [await limiter.hit("user:1", rate, bucket="api_read") for _ in range(6)]
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert limiter.stats()["fallback_hits"] == 6
+        
+        backend.down = False
+        assert (await limiter.hit("user:1", rate, bucket="api_read")).allowed
+        await asyncio.sleep(0.01)  # the charge runs in the background
+        # The live call, then the 5 requests allowed during the outage
+        assert backend.charged == [("user:1", "api_read", 1), ("user:1", "api_read", 5)]
+    
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_redis_killed_mid_load(self, monkeypatch):
+        """Latency stays bounded when Redis dies under load, and Redis takes over again after."""
+        from fastapi import Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import rate_limiting
+        from app.redis_client import RedisManager
+        from app.utils.circuit_breaker import CircuitBreaker
+        
+        server = os.getenv("REDIS_SERVER_BIN") or shutil.which("redis-server")
+        if server is None:
+            pytest.skip("redis-server is not available")
+        port = 6391
+        
+        def start_redis():
+            process = subprocess.Popen(
+                [server, "--port", str(port), "--save", "", "--appendonly", "no"],
+                stdout=subprocess.DEVNULL,
+            )
+            time.sleep(0.2)
+            return process
+        
+        process = start_redis()
+        manager = RedisManager(f"redis://127.0.0.1:{port}/0")
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.5, call_timeout=0.05)
+        limiter = LeasedRateLimiter(
+            RedisRateLimiter(manager, breaker=breaker), fallback=LocalRateLimiter(workers=1)
+        )
+        monkeypatch.setattr(rate_limiting, "rate_limiter", limiter)
+        monkeypatch.setattr(rate_limiting, "rate_limit_policy", rate_limiting.RateLimitPolicyStore())
+        app = FastAPI()
+        
+        @app.get("/api/v1/things", dependencies=[Depends(rate_limiting.enforce_policy)])
+        async def things():
+            return {}
+        
+        latencies = {"before": [], "outage": [], "after": []}
+        phase = "before"
+        
+        async def load(client_ip, client):
+            while phase != "done":
+                current = phase
+                start = time.perf_counter()
+                response = await client.get("/api/v1/things")
+                latencies[current].append(time.perf_counter() - start)
+                assert response.status_code in (200, 429)
+                await asyncio.sleep(0.001)
+        
+        try:
+            transports = [ASGITransport(app=app, client=(f"192.0.2.{i}", 4000)) for i in range(20)]
+            clients = [AsyncClient(transport=t, base_url="http://test") for t in transports]
+            tasks = [asyncio.create_task(load(f"192.0.2.{i}", c)) for i, c in enumerate(clients)]
+            
+            await asyncio.sleep(0.5)
+            phase = "outage"
+            process.kill()
+            process.wait()
+            await asyncio.sleep(1.0)
+            
+            phase = "after"
+            process = start_redis()
+            await asyncio.sleep(1.5)
+            phase = "done"
+            await asyncio.gather(*tasks)
+        finally:
+            for client in clients:
+                await client.aclose()
+            await manager.close()
+            process.kill()
+            process.wait()
+        
+        from tests.test_performance import percentile
+        for name, samples in latencies.items():
+            print(
+                f"{name}: {len(samples)} requests, p50 {percentile(samples, 50) * 1000:.2f}ms, "
+                f"p99 {percentile(samples, 99) * 1000:.2f}ms, max {max(samples) * 1000:.1f}ms"
+            )
+        
+        # Worst case while failing over is the breaker's call timeout, not 5s socket timeouts
+        assert max(latencies["outage"]) < 0.5
+        assert percentile(latencies["outage"], 99) < 0.1
+        assert limiter.fallback_hits > 0
+        # Redis is in charge again
+        assert breaker.state == "closed"
+        assert limiter.fallback.spent == {}
@@ -0,0 +1,63 @@
+import pytest
+import os
+import subprocess
+import sys
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+
+from app import metrics
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+class TestMetrics:
+    """Test request and dependency metrics."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_requests_recorded_by_route_template(self):
+        from fastapi import FastAPI
+        from app.core.middleware import setup_middleware
+        from app.main import metrics_endpoint
+
+        app = FastAPI()
+        setup_middleware(app)
+        app.add_api_route("/metrics", metrics_endpoint)
+
+        @app.get("/things/{thing_id}")
+        async def thing(thing_id: int):
+            return {}
+
+        route = "/things/{thing_id}"
+        before = sample("http_request_duration_seconds_count", method="GET", route=route)
+        before_404 = sample("http_requests_total", method="GET", route=metrics.UNMATCHED_ROUTE, status="404")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            for thing_id in range(3):
+                await ac.get(f"/things/{thing_id}")
+            await ac.get("/missing")
+            exposition = (await ac.get("/metrics")).text
+
+        assert sample("http_request_duration_seconds_count", method="GET", route=route) == before + 3
+        assert sample("http_requests_total", method="GET", route=route, status="200") >= 3
+        assert sample("http_requests_total", method="GET", route=metrics.UNMATCHED_ROUTE, status="404") == before_404 + 1
+        assert 'http_request_duration_seconds_bucket{le="0.0005",method="GET",route="/things/{thing_id}"}' in exposition
+
+    @pytest.mark.unit
+    def test_dependency_calls(self):
+        before = sample("dependency_call_duration_seconds_count", system="redis", operation="test")
+        metrics.observe_dependency_call("redis", "test", 0.002)
+        assert sample("dependency_call_duration_seconds_count", system="redis", operation="test") == before + 1
+        assert sample("dependency_call_duration_seconds_bucket", system="redis", operation="test", le="0.0025") >= 1
+
+    @pytest.mark.unit
+    def test_multiprocess_aggregation(self, tmp_path):
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+        record = "from app import metrics\nfor _ in range(3): metrics.observe_request('GET', '/x', 200, 0.01)"
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", record], env=env, check=True)
+
+        render = "from app import metrics\nprint(metrics.render_metrics()[0].decode())"
+        output = subprocess.run(
+            [sys.executable, "-c", render], env=env, check=True, capture_output=True, text=True
+        ).stdout
+        assert 'http_requests_total{method="GET",route="/x",status="200"} 6.0' in output
@@ -0,0 +1,102 @@
+import pytest
+import asyncio
+
+from app.monitoring import RateLimitMonitor
+
+@pytest.mark.rate_limiting
+class TestRateLimitMonitor:
+    """Test pre-aggregated rate limit stats against a local Redis."""
+
+    @pytest.mark.asyncio
+    async def test_aggregates_limited_requests(self, test_redis, monkeypatch):
+        monitor = RateLimitMonitor(test_redis, bucket_seconds=60, retention_seconds=3600)
+
+        now = [1_000_000.0]
+        monkeypatch.setattr("app.monitoring.time.time", lambda: now[0])
+        for _ in range(3):
+            await monitor.record_limited("ip:203.0.113.9", "anonymous", "auth_login")
+        now[0] += 120  # two buckets later
+        await monitor.record_limited("user:7", "premium", "api_write", count=5)
+        await monitor.record_limited("ip:203.0.113.9", "anonymous", "api_read")
+
+        stats = await monitor.get_rate_limit_stats(time_window=600)
+        assert stats["total_limited"] == 9
+        assert stats["by_user_type"] == {"anonymous": 4, "premium": 5}
+        assert stats["by_endpoint"] == {"auth_login": 3, "api_write": 5, "api_read": 1}
+        assert stats["top_limited_users"] == [
+            {"user_key": "user:7", "count": 5},
+            {"user_key": "ip:203.0.113.9", "count": 4},
+        ]
+
+        # Only the current bucket falls inside a one-minute window
+        recent = await monitor.get_rate_limit_stats(time_window=60)
+        assert recent["by_user_type"] == {"anonymous": 1, "premium": 5}
+
+        redis_client = await test_redis.get_async_client()
+        assert not await redis_client.keys("rate_limit_stats:top:*")
+
+    @pytest.mark.asyncio
+    async def test_count_keys_uses_scan_budget(self, test_redis):
+        redis_client = await test_redis.get_async_client()
+        await redis_client.mset({f"rate_limit:ip:{i}": 1 for i in range(2500)})
+        monitor = RateLimitMonitor(test_redis)
+
+        assert await monitor.count_keys("rate_limit:*") == {"count": 2500, "complete": True}
+        partial = await monitor.count_keys("rate_limit:*", budget_seconds=0)
+        assert partial["complete"] is False
+        assert partial["count"] < 2500
+
+def make_request(client_ip: str = "203.0.113.9"):
+    from starlette.requests import Request
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/auth/login",
+        "headers": [(b"user-agent", b"pytest")],
+        "query_string": b"",
+        "client": (client_ip, 1234),
+    })
+
+@pytest.mark.rate_limiting
+class TestRateLimitHitLog:
+    """Test the background batched hit log."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("use_stream", [False, True])
+    async def test_hits_are_written_in_batches(self, test_redis, use_stream):
+        monitor = RateLimitMonitor(test_redis, batch_size=50, max_entries=100, use_stream=use_stream)
+        for i in range(120):
+            assert monitor.log_rate_limit_hit(make_request(), "10/hour", f"ip:10.0.0.{i % 3}", "anonymous", "auth_login")
+        await monitor.close()
+
+        assert monitor.hits.stats() == {"queued": 0, "written": 120, "dropped": 0, "failed": 0}
+        stats = await monitor.get_rate_limit_stats(time_window=60)
+        assert stats["by_endpoint"] == {"auth_login": 120}
+        assert stats["top_limited_users"][0]["count"] == 40
+        assert stats["recent_limits"][0]["user_agent"] == "pytest"
+        assert stats["recent_limits"][0]["endpoint"] == "/api/v1/auth/login"
+
+    @pytest.mark.asyncio
+    async def test_background_writer_drains_queue(self, test_redis):
+        monitor = RateLimitMonitor(test_redis, flush_interval=0.01)
+        monitor.log_rate_limit_hit(make_request(), "10/hour", "ip:10.0.0.1", "anonymous", "auth_login")
+        for _ in range(100):
+            if monitor.hits.written:
+                break
+            await asyncio.sleep(0.01)
+        assert monitor.hits.written == 1
+        await monitor.close()
+
+    @pytest.mark.asyncio
+    async def test_overload_drops_and_counts(self):
+        from app.redis_client import RedisManager
+
+        # Unreachable Redis: logging must still return immediately
+        monitor = RateLimitMonitor(RedisManager("redis://127.0.0.1:1/0"), max_queue=5, flush_interval=60)
+        results = [
+            monitor.log_rate_limit_hit(make_request(), "10/hour", "ip:10.0.0.1", "anonymous", "auth_login")
+            for _ in range(8)
+        ]
+        assert results == [True] * 5 + [False] * 3
+        await monitor.close()
+        assert monitor.hits.stats() == {"queued": 0, "written": 0, "dropped": 3, "failed": 5}
@@ -0,0 +1,73 @@
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.utils.pagination import clamp_page_size, decode_cursor, encode_cursor
+
+class TestCursor:
+    """Test opaque cursor encoding."""
+    
+    @pytest.mark.unit
+    def test_roundtrip(self):
+        cursor = encode_cursor({"id": 12345})
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == {"id": 12345}
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "WzFd", "%%%"])
+    def test_malformed_cursor(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+    @pytest.mark.unit
+    def test_page_size_is_capped(self):
+        assert clamp_page_size(settings.MAX_PAGE_SIZE * 10) == settings.MAX_PAGE_SIZE
+        assert clamp_page_size(-5) == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_empty_page_has_no_next_cursor(self):
+        from app.controllers.user import user_controller
+        
+        # Returns before touching the database
+        page = await user_controller.get_page(None, cursor=encode_cursor({"id": 5}), limit=0)
+        assert page == ([], None)
+
+class TestKeysetPagination:
+    """Test cursor pagination on the users endpoint."""
+    
+    @pytest.mark.asyncio
+    async def test_walk_all_pages(self, client: AsyncClient, test_db, auth_headers: dict):
+        """Following X-Next-Cursor should visit every user exactly once, in order."""
+        await test_db.user.create_many(
+            data=[
+                {"email": f"page{i}@example.com", "name": f"Page {i}", "password": "x"}
+                for i in range(25)
+            ]
+        )
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/api/v1/users/", headers=auth_headers, params=params)
+            assert response.status_code == 200
+            seen.extend(user["id"] for user in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        
+        # 25 seeded users plus the authenticated test user
+        assert len(seen) == 26
+        assert seen == sorted(set(seen))
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, client: AsyncClient, auth_headers: dict):
+        response = await client.get(
+            "/api/v1/users/",
+            headers=auth_headers,
+            params={"cursor": "garbage"}
+        )
+        assert response.status_code == 400
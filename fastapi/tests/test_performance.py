@@ -1,8 +1,16 @@
 import pytest
 import asyncio
+import os
 import time
 from httpx import AsyncClient
-from concurrent.futures import ThreadPoolExecutor
+
+from tests.conftest import make_user
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
 
 class TestPerformance:
     """Test performance and load handling."""
@@ -61,21 +69,501 @@ class TestPerformance:
             assert len(data) <= page_size
 
     @pytest.mark.performance
+    @pytest.mark.slow
     @pytest.mark.asyncio
-    async def test_database_connection_pooling(self, client: AsyncClient):
-        """Test database connection handling under load."""
-        async def make_request():
-            response = await client.get("/health")
+    async def test_database_connection_pooling(self, test_db, monkeypatch):
+        """Concurrent queries should scale with the pool; warm-up should hide cold connects."""
+        from prisma import Prisma
+        from app.config import settings
+        from app.database import build_database_url, warm_up_database
+        
+        async def run_queries(db, concurrency, total):
+            latencies = []
+            
+            async def worker(count):
+                for _ in range(count):
+                    start = time.perf_counter()
+                    await db.user.count()
+                    latencies.append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            await asyncio.gather(*[worker(total // concurrency) for _ in range(concurrency)])
+            return time.perf_counter() - start, latencies
+        
+        throughput = {}
+        for connection_limit in (1, 10):
+            monkeypatch.setattr(settings, "DB_CONNECTION_LIMIT", connection_limit)
+            db = Prisma(datasource={"url": build_database_url(settings.DATABASE_URL)})
+            await db.connect()
+            try:
+                await warm_up_database(connection_limit, client=db)
+                duration, latencies = await run_queries(db, concurrency=50, total=500)
+            finally:
+                await db.disconnect()
+            
+            throughput[connection_limit] = len(latencies) / duration
+            print(
+                f"connection_limit={connection_limit}: {throughput[connection_limit]:.0f} queries/s, "
+                f"p50 {percentile(latencies, 50) * 1000:.1f}ms, p99 {percentile(latencies, 99) * 1000:.1f}ms"
+            )
+        
+        # A single connection serializes every query
+        assert throughput[10] > throughput[1]
+        
+        # First burst of requests after a deploy, with and without warm-up
+        monkeypatch.setattr(settings, "DB_CONNECTION_LIMIT", 10)
+        for warm_up in (False, True):
+            db = Prisma(datasource={"url": build_database_url(settings.DATABASE_URL)})
+            await db.connect()
+            try:
+                if warm_up:
+                    await warm_up_database(10, client=db)
+                duration, latencies = await run_queries(db, concurrency=10, total=10)
+            finally:
+                await db.disconnect()
+            print(f"first burst (warm_up={warm_up}): max {max(latencies) * 1000:.1f}ms")
+
+    @pytest.mark.performance
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_health_latency_during_login_storm(self, client: AsyncClient, test_user, monkeypatch):
+        """Health p99 should stay flat while bcrypt runs off the event loop."""
+        from app.config import settings
+        monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+        
+        async def probe_health(samples, count):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.get("/health")
+                samples.append(time.perf_counter() - start)
+                assert response.status_code == 200
+        
+        # Baseline with an idle worker
+        baseline = []
+        await probe_health(baseline, 200)
+        
+        async def login():
+            response = await client.post(
+                "/api/v1/auth/login",
+                json={"email": "test@example.com", "password": "testpassword"}
+            )
             return response.status_code
         
-        # Make 50 concurrent requests
-        tasks = [make_request() for _ in range(50)]
-        start_time = time.time()
-        results = await asyncio.gather(*tasks)
-        end_time = time.time()
+        # Same probe while 100 logins (bcrypt verifies) are in flight
+        during_storm = []
+        storm = asyncio.gather(*[login() for _ in range(100)])
+        await probe_health(during_storm, 200)
+        statuses = await storm
         
-        # All should succeed
-        assert all(status == 200 for status in results)
+        # Logins either succeed or are shed with a fast 503
+        assert set(statuses) <= {200, 503}
         
-        duration = end_time - start_time
-        print(f"50 concurrent health checks completed in {duration:.2f} seconds")
+        baseline_p99 = percentile(baseline, 99)
+        storm_p99 = percentile(during_storm, 99)
+        print(f"/health p99 idle: {baseline_p99 * 1000:.2f}ms, during login storm: {storm_p99 * 1000:.2f}ms")
+        
+        # A single on-loop bcrypt round alone would be ~100ms+
+        assert storm_p99 < max(baseline_p99 * 5, 0.05)
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_verify_token_cold_vs_warm(self):
+        """Microbenchmark verify_token with cold and warm auth caches."""
+        from app.core.principal_cache import principal_cache
+        from app.core.security import claims_cache, create_access_token, verify_token
+        
+        class FakeUserActions:
+            async def find_unique(self, where):
+                return make_user(id=where["id"], email="bench@example.com", name="Bench")
+        
+        class FakeDB:
+            user = FakeUserActions()
+        
+        db = FakeDB()
+        token = create_access_token(subject=1)
+        iterations = 2000
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            claims_cache.clear()
+            principal_cache.clear()
+            await verify_token(token, db)
+        cold = (time.perf_counter() - start) / iterations
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await verify_token(token, db)
+        warm = (time.perf_counter() - start) / iterations
+        
+        claims_cache.clear()
+        principal_cache.clear()
+        print(f"verify_token cold: {cold * 1e6:.1f}us, warm: {warm * 1e6:.1f}us ({cold / warm:.1f}x)")
+        assert warm < cold
+
+    @pytest.mark.performance
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_keyset_pagination_depth(self, client: AsyncClient, test_db, auth_headers: dict):
+        """Keyset pages should cost the same at page 1 and page 10,000."""
+        from app.utils.pagination import encode_cursor
+        
+        total_rows = int(os.getenv("BENCH_USERS_ROWS", "1000000"))
+        page_size = 100
+        chunk = 10000
+        for offset in range(0, total_rows, chunk):
+            await test_db.user.create_many(
+                data=[
+                    {"email": f"bench{i}@example.com", "name": f"Bench {i}", "password": "x"}
+                    for i in range(offset, min(offset + chunk, total_rows))
+                ]
+            )
+        first_id = (await test_db.user.find_first(order={"id": "asc"})).id
+        
+        async def time_page(page):
+            params = {"limit": page_size}
+            if page > 1:
+                # ids are contiguous after seeding, so jump straight to the page
+                params["cursor"] = encode_cursor({"id": first_id + (page - 1) * page_size - 1})
+            samples = []
+            for _ in range(5):
+                start = time.perf_counter()
+                response = await client.get("/api/v1/users/", headers=auth_headers, params=params)
+                samples.append(time.perf_counter() - start)
+                assert response.status_code == 200
+                assert len(response.json()) == page_size
+            return sorted(samples)[len(samples) // 2]
+        
+        pages = [p for p in (1, 10, 100, 1000, 10000) if p * page_size <= total_rows]
+        latencies = {page: await time_page(page) for page in pages}
+        for page, latency in latencies.items():
+            print(f"page {page}: {latency * 1000:.2f}ms")
+        
+        assert latencies[pages[-1]] < latencies[1] * 3
+
+    @pytest.mark.performance
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_users_export_constant_memory(self, test_db):
+        """Streaming export memory must not grow with table size."""
+        import tracemalloc
+        from app.api.v1.endpoints.admin import stream_users_export
+        
+        total_rows = int(os.getenv("BENCH_EXPORT_ROWS", "2000000"))
+        chunk = 10000
+        for offset in range(0, total_rows, chunk):
+            await test_db.user.create_many(
+                data=[
+                    {"email": f"export{i}@example.com", "name": f"Export {i}", "password": "x"}
+                    for i in range(offset, min(offset + chunk, total_rows))
+                ]
+            )
+        
+        tracemalloc.start()
+        try:
+            lines = 0
+            start = time.perf_counter()
+            async for chunk_text in stream_users_export(test_db, "ndjson"):
+                lines += chunk_text.count("\n")
+            duration = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        print(f"Exported {lines} rows in {duration:.1f}s, peak memory {peak / 2**20:.1f} MiB")
+        assert lines == total_rows
+        assert peak < 64 * 2**20
+
+    @pytest.mark.performance
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_bulk_create_throughput(self, test_db):
+        """Compare rows/sec of create_many against the single-row path."""
+        from app.controllers.user import user_controller
+        from app.schemas.user import UserCreate
+        
+        rows = int(os.getenv("BENCH_BULK_ROWS", "500"))
+        
+        def batch(prefix):
+            return [
+                UserCreate(name=f"{prefix} {i}", email=f"{prefix}{i}@bulk.com", password="password123")
+                for i in range(rows)
+            ]
+        
+        start = time.perf_counter()
+        for user_in in batch("single"):
+            if not await user_controller.get_by_email(test_db, email=user_in.email):
+                await user_controller.create(test_db, obj_in=user_in)
+        single_rate = rows / (time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        results = await user_controller.create_many(test_db, objs_in=batch("bulk"))
+        bulk_rate = rows / (time.perf_counter() - start)
+        
+        assert all(r.status == "created" for r in results)
+        print(f"single-row: {single_rate:.0f} rows/s, bulk: {bulk_rate:.0f} rows/s ({bulk_rate / single_rate:.1f}x)")
+        assert bulk_rate > single_rate
+
+    @pytest.mark.performance
+    @pytest.mark.rate_limiting
+    @pytest.mark.asyncio
+    async def test_rate_limiter_vs_slowapi(self, test_redis, monkeypatch):
+        """Compare requests/sec of the Lua limiter with slowapi on a local Redis."""
+        from fastapi import Depends, FastAPI, Request
+        from httpx import ASGITransport
+        from slowapi import Limiter
+        from slowapi.util import get_remote_address
+        from app import rate_limiting
+        from app.limiter import LeasedRateLimiter, RedisRateLimiter
+        
+        requests = 2000
+        slowapi_limiter = Limiter(key_func=get_remote_address, storage_uri=test_redis.redis_url)
+        monkeypatch.setattr(
+            rate_limiting, "rate_limiter", LeasedRateLimiter(RedisRateLimiter(test_redis))
+        )
+        
+        slowapi_app = FastAPI()
+        slowapi_app.state.limiter = slowapi_limiter
+        
+        @slowapi_app.get("/ping")
+        @slowapi_limiter.limit("1000000/hour")
+        async def slowapi_ping(request: Request):
+            return {}
+        
+        native_app = FastAPI()
+        
+        @native_app.get("/ping", dependencies=[Depends(rate_limiting.rate_limit("1000000/hour"))])
+        async def native_ping():
+            return {}
+        
+        async def measure(app, concurrency):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+                async def worker():
+                    for _ in range(requests // concurrency):
+                        assert (await ac.get("/ping")).status_code == 200
+                
+                start = time.perf_counter()
+                await asyncio.gather(*[worker() for _ in range(concurrency)])
+                return time.perf_counter() - start
+        
+        bare_app = FastAPI()
+        
+        @bare_app.get("/ping")
+        async def bare_ping():
+            return {}
+        
+        for concurrency in (1, 50):
+            bare = await measure(bare_app, concurrency)
+            slowapi_time = await measure(slowapi_app, concurrency)
+            native_time = await measure(native_app, concurrency)
+            for name, duration in (("slowapi", slowapi_time), ("lua", native_time)):
+                added = (duration - bare) / requests * 1000
+                print(f"{name} x{concurrency}: {requests / duration:.0f} req/s, +{added:.3f}ms per request")
+            
+            # The two are within noise of each other, so only bound the limiter's own cost
+            assert (native_time - bare) / requests < 0.005
+
+    @pytest.mark.performance
+    def test_compiled_rate_limit_policy(self):
+        """Microbenchmark compiled policy lookup against per-request string matching."""
+        from fastapi import FastAPI
+        from starlette.requests import Request
+        from app.config import Settings
+        from app.limiter import Rate
+        from app.rate_limiting import compile_policy, get_endpoint_category, get_user_type, resolve_limit
+        from app.utils.ip_prefix import PrefixSet
+        
+        app = FastAPI()
+        for index in range(50):
+            app.add_api_route(f"/api/v1/resource{index}/{{item_id}}", lambda item_id: {}, methods=["GET"])
+        config = Settings(RATE_LIMIT_WHITELIST=[f"10.{i}.0.0/16" for i in range(200)])
+        policy = compile_policy(app.routes, config)
+        whitelist = [str(network) for network in PrefixSet(config.RATE_LIMIT_WHITELIST)]
+        
+        scope = {"type": "http", "app": app, "method": "GET", "path": "/api/v1/resource49/7",
+                 "headers": [], "query_string": b"", "client": ("203.0.113.7", 1234)}
+        for route in app.routes:
+            match, child_scope = route.matches(scope)
+            if match.name == "FULL":
+                scope.update(child_scope)
+                break
+        request = Request(scope)
+        iterations = 20000
+        
+        def uncompiled():
+            if request.client.host in whitelist:
+                return None
+            return Rate.parse(resolve_limit(config, get_user_type(request), get_endpoint_category(request)))
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            uncompiled()
+        before = (time.perf_counter() - start) / iterations
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            policy.resolve(request)
+        after = (time.perf_counter() - start) / iterations
+        
+        assert policy.resolve(request).rate == uncompiled()
+        print(f"rate limit resolution uncompiled: {before * 1e6:.2f}us, compiled: {after * 1e6:.2f}us")
+        assert after < before
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_middleware_overhead(self):
+        """Requests/sec of /health with no middleware, the ASGI stack and a BaseHTTPMiddleware stack."""
+        from fastapi import FastAPI
+        from fastapi.middleware.cors import CORSMiddleware
+        from httpx import ASGITransport
+        from starlette.middleware.base import BaseHTTPMiddleware
+        from app.core.middleware import setup_middleware
+        
+        class Passthrough(BaseHTTPMiddleware):
+            async def dispatch(self, request, call_next):
+                return await call_next(request)
+        
+        def build(stack):
+            app = FastAPI()
+            
+            @app.get("/health")
+            async def health():
+                return {"status": "healthy"}
+            
+            if stack != "bare":
+                app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+            if stack == "asgi":
+                setup_middleware(app)
+            elif stack == "base_http":
+                # Shape of the previous logging + error handling middlewares
+                app.add_middleware(Passthrough)
+                app.add_middleware(Passthrough)
+            return app
+        
+        requests = 3000
+        rates = {}
+        for stack in ("bare", "asgi", "base_http"):
+            async with AsyncClient(transport=ASGITransport(app=build(stack)), base_url="http://test") as ac:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    assert (await ac.get("/health")).status_code == 200
+                rates[stack] = requests / (time.perf_counter() - start)
+        
+        print(", ".join(f"{stack}: {rate:.0f} req/s" for stack, rate in rates.items()))
+        assert rates["asgi"] > rates["base_http"]
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_metrics_overhead(self):
+        """Per-request cost of recording metrics in the ASGI middleware."""
+        from app import metrics
+        from app.core.middleware import RequestTimingMiddleware
+        
+        iterations = 100000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            metrics.observe_request("GET", "/bench", 200, 0.003)
+        per_call = (time.perf_counter() - start) / iterations
+        
+        class Route:
+            path = "/health"
+        
+        async def endpoint(scope, receive, send):
+            scope["route"] = Route
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+        
+        async def receive():
+            return {"type": "http.request", "body": b""}
+        
+        async def send(message):
+            pass
+        
+        requests = 50000
+        durations = {}
+        for record_metrics in (False, True, False, True):
+            middleware = RequestTimingMiddleware(endpoint, record_metrics=record_metrics)
+            start = time.perf_counter()
+            for _ in range(requests):
+                await middleware({"type": "http", "method": "GET", "path": "/health"}, receive, send)
+            duration = (time.perf_counter() - start) / requests
+            durations[record_metrics] = min(duration, durations.get(record_metrics, duration))
+        
+        added = durations[True] - durations[False]
+        print(f"observe_request: {per_call * 1e6:.2f}us, middleware per request: "
+              f"{durations[False] * 1e6:.1f}us -> {durations[True] * 1e6:.1f}us with metrics (+{added * 1e6:.1f}us)")
+        assert per_call < 50e-6
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_readiness_probe_cost(self):
+        """/readyz answers from cached checks without touching DB or Redis."""
+        from app.health import HealthMonitor
+        
+        async def check():
+            await asyncio.sleep(0.005)  # a realistic round trip
+        
+        monitor = HealthMonitor({"database": check, "redis": check}, required=["database", "redis"])
+        await monitor.run_checks()
+        
+        iterations = 100000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            report = monitor.report()
+        per_probe = (time.perf_counter() - start) / iterations
+        
+        assert report["status"] == "ready"
+        print(f"readiness report: {per_probe * 1e6:.2f}us per probe "
+              f"(checks: {report['checks']['database']['latency_ms']}ms each, run in the background)")
+        assert per_probe < 100e-6
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_users_list_serialization_throughput(self):
+        """Requests/sec of a users page via response_model, the Pydantic render and the orjson row serializer."""
+        from datetime import datetime, timezone
+        from typing import List
+        from fastapi import FastAPI, Response
+        from httpx import ASGITransport
+        from app.api.v1.endpoints.users import user_list_adapter, user_serializer
+        from app.schemas.user import UserResponse
+        
+        now = datetime.now(timezone.utc)
+        rows = [
+            make_user(id=i, email=f"user{i}@example.com", name=f"User {i}", password="hash",
+                      created_at=now, updated_at=now)
+            for i in range(1000)
+        ]
+        
+        app = FastAPI()
+        
+        @app.get("/response_model", response_model=List[UserResponse])
+        async def via_response_model(limit: int):
+            return rows[:limit]
+        
+        @app.get("/pydantic")
+        async def via_pydantic(limit: int):
+            page = user_list_adapter.validate_python(rows[:limit], from_attributes=True)
+            return Response(user_list_adapter.dump_json(page), media_type="application/json")
+        
+        @app.get("/orjson")
+        async def via_orjson(limit: int):
+            return Response(user_serializer.many(rows[:limit]), media_type="application/json")
+        
+        rates = {}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            for limit in (10, 100, 1000):
+                requests = 5000 // limit
+                bodies = {}
+                for path in ("response_model", "pydantic", "orjson"):
+                    start = time.perf_counter()
+                    for _ in range(requests):
+                        response = await ac.get(f"/{path}", params={"limit": limit})
+                    rates[limit, path] = requests / (time.perf_counter() - start)
+                    bodies[path] = response.json()
+                assert bodies["orjson"] == bodies["pydantic"] == bodies["response_model"]
+                print(f"page of {limit}: " + ", ".join(
+                    f"{path}: {rates[limit, path]:.0f} req/s" for path in ("response_model", "pydantic", "orjson")
+                ))
+        
+        for limit in (100, 1000):
+            assert rates[limit, "orjson"] > rates[limit, "response_model"]
@@ -0,0 +1,96 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.config import settings
+from app.core import query_tracking
+
+class TestQueryTracking:
+    """Test per-request database query tracking."""
+
+    @pytest.mark.unit
+    def test_counts_queries_per_request(self):
+        token = query_tracking.begin_request("/api/v1/users/")
+        with query_tracking.track_query("User", "find_many", {"where": {"is_active": True}}):
+            pass
+        with query_tracking.track_query("User", "count"):
+            pass
+        stats = query_tracking.end_request(token)
+
+        assert stats.count == 2
+        assert stats.seconds >= 0
+        assert query_tracking.current_stats() is None
+
+    @pytest.mark.unit
+    def test_flags_n_plus_one(self, monkeypatch, caplog):
+        monkeypatch.setattr(settings, "DB_DETECT_N_PLUS_ONE", True)
+        monkeypatch.setattr(settings, "DB_N_PLUS_ONE_THRESHOLD", 3)
+
+        token = query_tracking.begin_request("/api/v1/users/")
+        for user_id in range(4):
+            with query_tracking.track_query("User", "find_unique", {"where": {"id": user_id}}):
+                pass
+        with query_tracking.track_query("User", "find_many", {"where": {}}):
+            pass
+        stats = query_tracking.end_request(token)
+
+        assert stats.repeated_queries(3) == ["User.find_unique(id) x4"]
+        assert "Possible N+1 query in /api/v1/users/: User.find_unique(id) x4" in caplog.text
+
+    @pytest.mark.unit
+    def test_slow_query_samples(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 0)
+        monkeypatch.setattr(settings, "DB_SLOW_QUERY_SAMPLE_RATE", 1.0)
+        query_tracking.slow_queries.clear()
+
+        with query_tracking.track_query("User", "find_first", {"where": {"email": "secret@example.com"}}):
+            pass
+        monkeypatch.setattr(settings, "DB_SLOW_QUERY_SAMPLE_RATE", 0.0)
+        with query_tracking.track_query("User", "find_first", {"where": {"email": "secret@example.com"}}):
+            pass
+
+        assert len(query_tracking.slow_queries) == 1
+        sample = query_tracking.slow_queries[0]
+        # Shape only: filter values are never recorded
+        assert sample["query"] == "User.find_first(email)"
+        assert "secret" not in str(sample)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_instrumented_client(self, monkeypatch):
+        from prisma import Prisma
+        from app.database import InstrumentedPrisma
+
+        async def fake_execute(self, *, method, arguments, model=None, root_selection=None):
+            return {"method": method}
+
+        monkeypatch.setattr(Prisma, "_execute", fake_execute, raising=False)
+        client = InstrumentedPrisma()
+
+        class User:
+            pass
+
+        token = query_tracking.begin_request("/test")
+        result = await client._execute(method="find_unique", arguments={"where": {"id": 1}}, model=User)
+        stats = query_tracking.end_request(token)
+        assert result == {"method": "find_unique"}
+        assert stats.count == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_server_timing_header(self):
+        from fastapi import FastAPI
+        from app.core.middleware import setup_middleware
+
+        app = FastAPI()
+        setup_middleware(app)
+
+        @app.get("/things")
+        async def things():
+            for _ in range(3):
+                with query_tracking.track_query("Thing", "find_many"):
+                    pass
+            return {}
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/things")
+        assert 'desc="3 queries"' in response.headers["Server-Timing"]
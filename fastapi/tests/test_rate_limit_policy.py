@@ -0,0 +1,130 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from app.config import Settings
+from app.rate_limiting import RateLimitPolicyStore, compile_policy
+from app.utils.ip_prefix import PrefixSet
+
+def make_request(app: FastAPI, method: str, path: str, client_ip: str = "203.0.113.7", user=None) -> Request:
+    """Build a request routed the way Starlette would route it"""
+    scope = {
+        "type": "http",
+        "app": app,
+        "method": method,
+        "path": path,
+        "headers": [],
+        "query_string": b"",
+        "client": (client_ip, 1234),
+    }
+    for route in app.routes:
+        match, child_scope = route.matches(scope)
+        if match.name == "FULL":
+            scope.update(child_scope)
+            break
+    request = Request(scope)
+    if user is not None:
+        request.state.user = user
+    return request
+
+@pytest.fixture
+def policy_app():
+    app = FastAPI()
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return {}
+
+    @app.get("/api/v1/users/{user_id}")
+    async def read_user(user_id: int):
+        return {}
+
+    @app.delete("/api/v1/users/{user_id}")
+    async def delete_user(user_id: int):
+        return {}
+
+    return app
+
+class TestPrefixSet:
+    """Test IP prefix membership."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("address,expected", [
+        ("127.0.0.1", True),
+        ("10.2.3.4", True),
+        ("11.0.0.1", False),
+        ("192.168.1.130", True),
+        ("192.168.1.127", False),
+        ("::ffff:10.9.9.9", True),
+        ("::1", True),
+        ("2001:db8::1", True),
+        ("2001:db9::1", False),
+        ("not-an-ip", False),
+    ])
+    def test_contains(self, address, expected):
+        networks = PrefixSet(["127.0.0.1", "::1", "10.0.0.0/8", "192.168.1.128/25", "2001:db8::/32"])
+        assert (address in networks) is expected
+
+    @pytest.mark.unit
+    def test_invalid_network(self):
+        with pytest.raises(ValueError):
+            PrefixSet(["10.0.0.0/33"])
+
+class TestRateLimitPolicy:
+    """Test the compiled rate limit policy table."""
+
+    @pytest.mark.unit
+    def test_limits_by_route_and_user_type(self, policy_app):
+        policy = compile_policy(policy_app.routes, Settings())
+
+        login = policy.resolve(make_request(policy_app, "POST", "/api/v1/auth/login"))
+        assert (login.category, login.limit, login.lease_fraction) == ("auth_login", "10/hour", 0.0)
+
+        anonymous = policy.resolve(make_request(policy_app, "GET", "/api/v1/users/5"))
+        assert (anonymous.category, anonymous.limit) == ("api_read", "100/hour")
+
+        user = SimpleNamespace(id=5, role="premium")
+        premium = policy.resolve(make_request(policy_app, "DELETE", "/api/v1/users/5", user=user))
+        assert (premium.category, premium.limit) == ("api_write", "10000/hour")
+        assert premium.rate.limit == 10000
+
+    @pytest.mark.unit
+    def test_unrouted_request_falls_back_to_category(self, policy_app):
+        policy = compile_policy(policy_app.routes, Settings())
+        resolved = policy.resolve(make_request(policy_app, "PUT", "/api/v1/unknown"))
+        assert resolved.category == "api_write"
+
+    @pytest.mark.unit
+    def test_lease_fractions_match_rate_limit_dependency(self, policy_app):
+        from app.rate_limiting import get_lease_fraction
+        
+        config = Settings(RATE_LIMIT_LEASE_FRACTIONS={"default": 0.2, "api_write": 0.0})
+        policy = compile_policy(policy_app.routes, config)
+        for method, path in (("GET", "/api/v1/users/1"), ("POST", "/api/v1/auth/login"), ("PUT", "/api/v1/unknown")):
+            resolved = policy.resolve(make_request(policy_app, method, path))
+            assert resolved.lease_fraction == get_lease_fraction(resolved.category, config)
+        assert policy.categories["api_write"]["anonymous"].lease_fraction == 0.0
+
+    @pytest.mark.unit
+    def test_whitelisted_and_disabled(self, policy_app):
+        config = Settings(RATE_LIMIT_WHITELIST=["198.51.100.0/24"])
+        policy = compile_policy(policy_app.routes, config)
+        assert policy.resolve(make_request(policy_app, "GET", "/api/v1/users/1", "198.51.100.20")) is None
+        assert policy.resolve(make_request(policy_app, "GET", "/api/v1/users/1")) is not None
+
+        disabled = compile_policy(policy_app.routes, Settings(RATE_LIMIT_ENABLED=False))
+        assert disabled.resolve(make_request(policy_app, "GET", "/api/v1/users/1")) is None
+
+    @pytest.mark.unit
+    def test_reload_swaps_policy(self, policy_app, monkeypatch):
+        store = RateLimitPolicyStore()
+        request = make_request(policy_app, "GET", "/api/v1/users/1")
+        before = store.get(request)
+        assert before.resolve(request).limit == "100/hour"
+
+        monkeypatch.setenv("USER_TYPE_RATE_LIMITS", '{"anonymous": {"api_read": "7/minute"}}')
+        after = store.reload()
+        assert after is store.get(request)
+        assert after.resolve(request).limit == "7/minute"
+        assert before.resolve(request).limit == "100/hour"
@@ -1,6 +1,4 @@
 import pytest
-import asyncio
-import time
 import httpx
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
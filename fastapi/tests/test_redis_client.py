@@ -0,0 +1,126 @@
+import pytest
+import asyncio
+import time
+
+from app.redis_client import RedisManager
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+async def ok():
+    return "ok"
+
+async def fail():
+    raise ConnectionError("connection refused")
+
+async def hang():
+    await asyncio.sleep(1)
+
+class TestCircuitBreaker:
+    """Test the circuit breaker guarding Redis calls."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60, call_timeout=0.02)
+
+        for call in (fail, ok, fail, fail):
+            try:
+                await breaker.call(call)
+            except ConnectionError:
+                pass
+        # A success in between resets the count
+        assert breaker.state == "closed"
+
+        with pytest.raises(TimeoutError):
+            await breaker.call(hang)
+        assert breaker.state == "open"
+
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        assert time.perf_counter() - start < 0.001
+        assert breaker.stats()["rejected"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_half_open_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01, call_timeout=1)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        await asyncio.sleep(0.02)
+        assert breaker.state == "half_open"
+
+        # Only one trial at a time; a failed trial re-opens
+        trial = asyncio.ensure_future(breaker.call(fail))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        with pytest.raises(ConnectionError):
+            await trial
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.02)
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == "closed"
+
+@pytest.mark.rate_limiting
+class TestRedisManager:
+    """Test the shared Redis pool and its helpers."""
+
+    @pytest.mark.asyncio
+    async def test_pool_is_warmed_and_bounded(self, test_redis):
+        await test_redis.connect(warmup_connections=4)
+        stats = test_redis.pool_stats()
+        assert stats["created"] >= 4
+        assert stats["in_use"] == 0
+        assert stats["max_connections"] == test_redis.max_connections
+
+    @pytest.mark.asyncio
+    async def test_batch_helpers(self, test_redis):
+        replies = await test_redis.batch(lambda pipe: pipe.set("a", 1).incr("a").get("a"))
+        assert replies == [True, 2, "2"]
+
+        async with test_redis.pipeline(transaction=True) as pipe:
+            pipe.incr("a").incr("a")
+            assert await pipe.execute() == [3, 4]
+
+    @pytest.mark.asyncio
+    async def test_rate_limiting_fails_open_during_brownout(self, monkeypatch):
+        from fastapi import Depends, FastAPI
+        from httpx import ASGITransport, AsyncClient
+        from app import rate_limiting
+        from app.limiter import LeasedRateLimiter, RedisRateLimiter
+
+        # A "Redis" that accepts connections and never answers
+        async def black_hole(reader, writer):
+            await reader.read()
+
+        server = await asyncio.start_server(black_hole, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        manager = RedisManager(f"redis://127.0.0.1:{port}/0", socket_timeout=5)
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60, call_timeout=0.05)
+        monkeypatch.setattr(
+            rate_limiting, "rate_limiter", LeasedRateLimiter(RedisRateLimiter(manager, breaker=breaker))
+        )
+        monkeypatch.setattr(rate_limiting, "rate_limit_policy", rate_limiting.RateLimitPolicyStore())
+        app = FastAPI()
+
+        @app.get("/api/v1/things", dependencies=[Depends(rate_limiting.enforce_policy)])
+        async def things():
+            return {}
+
+        latencies = []
+        try:
+            transport = ASGITransport(app=app, client=("192.0.2.1", 4000))
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                for _ in range(20):
+                    start = time.perf_counter()
+                    assert (await client.get("/api/v1/things")).status_code == 200
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            await manager.close()
+            server.close()
+
+        # Three slow calls open the breaker; after that Redis is not waited on at all
+        assert breaker.state == "open"
+        assert max(latencies) < 1
+        assert max(latencies[3:]) < 0.02
@@ -0,0 +1,199 @@
+import pytest
+import asyncio
+import json
+
+from app.core.response_cache import CachedResponse, ResponseCache
+from app.redis_client import redis_manager
+from tests.conftest import make_user
+
+def make_loader(body=b'{"id":1}'):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return CachedResponse(body, {"X-Next-Cursor": "abc"})
+
+    return loader, calls
+
+class TestResponseCache:
+    """Test the serialized response cache."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hits_skip_the_loader_until_a_tag_is_invalidated(self):
+        cache = ResponseCache(redis_manager)
+        loader, calls = make_loader()
+
+        first = await cache.get_or_load("user:1", ["user:1"], loader)
+        second = await cache.get_or_load("user:1", ["user:1"], loader)
+        assert first == second == CachedResponse(b'{"id":1}', {"X-Next-Cursor": "abc"})
+        assert len(calls) == 1
+
+        await cache.invalidate("user:2")
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        assert len(calls) == 1
+
+        await cache.invalidate("user:1")
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        assert len(calls) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        cache = ResponseCache(redis_manager)
+        loader, calls = make_loader()
+
+        results = await asyncio.gather(*[cache.get_or_load("users", ["users"], loader) for _ in range(50)])
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert cache.stats()["coalesced"] == 49
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_load_racing_an_invalidation_is_not_stored(self):
+        cache = ResponseCache(redis_manager)
+        loader, calls = make_loader()
+
+        load = asyncio.ensure_future(cache.get_or_load("users", ["users"], loader))
+        await asyncio.sleep(0)
+        await cache.invalidate("users")
+        await load
+        await cache.get_or_load("users", ["users"], loader)
+        assert len(calls) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_nothing_is_stored_while_replicas_may_lag_a_write(self):
+        cache = ResponseCache(redis_manager, settle_seconds=0.05)
+        loader, calls = make_loader()
+
+        await cache.invalidate("user:1")
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        assert len(calls) == 2  # possibly read from a lagging replica
+
+        await asyncio.sleep(0.06)
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        await cache.get_or_load("user:1", ["user:1"], loader)
+        assert len(calls) == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_waiter_and_are_not_cached(self):
+        cache = ResponseCache(redis_manager)
+        calls = []
+
+        async def missing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise LookupError("User not found")
+
+        results = await asyncio.gather(
+            *[cache.get_or_load("user:9", ["user:9"], missing) for _ in range(3)], return_exceptions=True
+        )
+        assert all(isinstance(result, LookupError) for result in results)
+        with pytest.raises(LookupError):
+            await cache.get_or_load("user:9", ["user:9"], missing)
+        assert len(calls) == 2
+
+    @pytest.mark.unit
+    def test_rendered_bytes_match_fastapi_encoding(self):
+        from datetime import datetime, timezone
+        from fastapi.encoders import jsonable_encoder
+        from app.api.v1.endpoints.users import render_user, render_users
+        from app.schemas.user import UserResponse
+
+        users = [
+            make_user(id=1, email="a@example.com", name="Zoë",
+                      created_at=datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+                      updated_at=datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+            make_user(id=2, email="b@example.com", name="B", is_active=False,
+                      created_at=datetime(2025, 1, 2, 3, 4, 5, 678901),
+                      updated_at=datetime(2025, 1, 2, 3, 4, 5)),
+        ]
+        expected = jsonable_encoder([UserResponse.model_validate(u, from_attributes=True) for u in users])
+        assert json.loads(render_users(users)) == expected
+        assert json.loads(render_user(users[0])) == expected[0]
+        assert expected[0]["created_at"] == "2025-01-02T03:04:05.678901Z"
+        assert expected[1]["created_at"] == "2025-01-02T03:04:05.678901"
+        assert b"hash" not in render_users(users)
+
+    @pytest.mark.unit
+    def test_fast_json_path_writes_the_same_bytes(self, monkeypatch):
+        from datetime import datetime, timezone
+        from app.api.v1.endpoints.users import render_user, render_users
+        from app.config import settings
+
+        users = [
+            make_user(id=1, email="a@example.com", name="Zoë \"quoted\"", password="hash",
+                      created_at=datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+                      updated_at=datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+            make_user(id=2, email="b@example.com", name="B", password="hash", is_active=False,
+                      created_at=datetime(2025, 1, 2, 3, 4, 5, 678901),
+                      updated_at=datetime(2025, 1, 2, 3, 4, 5)),
+        ]
+        expected = render_users(users), render_user(users[0]), render_users([])
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+        assert (render_users(users), render_user(users[0]), render_users([])) == expected
+        assert b'"created_at":"2025-01-02T03:04:05.678901Z"' in expected[0]
+        assert b'"created_at":"2025-01-02T03:04:05.678901"' in expected[0]
+        assert b"hash" not in render_users(users)
+
+    @pytest.mark.unit
+    def test_matching_if_none_match_gets_a_bodiless_304(self):
+        from datetime import datetime, timedelta
+        from app.utils.etag import page_etag, record_etag
+
+        user = make_user(id=7, updated_at=datetime(2025, 1, 1))
+        etag = record_etag(user)
+        assert etag == record_etag(user.model_copy())
+        assert etag != record_etag(user.model_copy(update={"updated_at": datetime(2025, 1, 1) + timedelta(milliseconds=1)}))
+        assert page_etag([user]) != page_etag([user, user.model_copy(update={"id": 8})])
+
+        cached = CachedResponse(b'{"id":7}', {"ETag": etag})
+        assert cached.to_response().status_code == 200
+        assert cached.to_response(if_none_match='W/"other"').body == b'{"id":7}'
+        for header in (etag, etag[2:], f'W/"other", {etag}', "*"):
+            not_modified = cached.to_response(if_none_match=header)
+            assert not_modified.status_code == 304
+            assert not_modified.body == b""
+            assert not_modified.headers["etag"] == etag
+            assert "content-length" not in not_modified.headers
+
+    @pytest.mark.rate_limiting
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared_and_invalidated_across_workers(self, test_redis):
+        worker_a = ResponseCache(test_redis, use_redis=True)
+        worker_b = ResponseCache(test_redis, use_redis=True)
+        loader, calls = make_loader()
+
+        await worker_a.get_or_load("users", ["users"], loader)
+        assert await worker_b.get_or_load("users", ["users"], loader) == CachedResponse(
+            b'{"id":1}', {"X-Next-Cursor": "abc"}
+        )
+        assert (len(calls), worker_b.redis_hits) == (1, 1)
+
+        await worker_a.invalidate("users")
+        worker_b.clear()  # as if its local entry had expired
+        await worker_b.get_or_load("users", ["users"], loader)
+        assert len(calls) == 2
+
+    @pytest.mark.rate_limiting
+    @pytest.mark.asyncio
+    async def test_redis_tier_shares_the_settle_window(self, test_redis):
+        worker_a = ResponseCache(test_redis, use_redis=True, settle_seconds=0.2)
+        worker_b = ResponseCache(test_redis, use_redis=True, settle_seconds=0.2)
+        loader, calls = make_loader()
+
+        # Worker B never saw the invalidation, but must not cache a replica read
+        await worker_a.invalidate("user:1")
+        await worker_b.get_or_load("user:1", ["user:1"], loader)
+        await worker_b.get_or_load("user:1", ["user:1"], loader)
+        await worker_a.get_or_load("user:1", ["user:1"], loader)
+        assert len(calls) == 3
+
+        await asyncio.sleep(0.25)
+        await worker_b.get_or_load("user:1", ["user:1"], loader)
+        await worker_a.get_or_load("user:1", ["user:1"], loader)
+        assert (len(calls), worker_a.redis_hits) == (4, 1)
@@ -0,0 +1,168 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from app.core.security import (
+    PasswordHashPool,
+    PasswordHashPoolSaturated,
+    get_password_hash,
+    hash_password_async,
+    verify_password_async,
+)
+from tests.conftest import make_user
+
+class TestPasswordHashPool:
+    """Test off-loop password hashing."""
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hash_and_verify_roundtrip(self):
+        """Async variants should be interchangeable with the sync ones."""
+        hashed = await hash_password_async("s3cret")
+        assert await verify_password_async("s3cret", hashed)
+        assert not await verify_password_async("wrong", hashed)
+        assert await verify_password_async("sync", get_password_hash("sync"))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_saturated_pool_rejects_fast(self):
+        """Jobs beyond workers + pending should fail immediately."""
+        pool = PasswordHashPool(max_workers=1, max_pending=1)
+        release = threading.Event()
+        
+        try:
+            running = [
+                asyncio.ensure_future(pool.run(release.wait)),
+                asyncio.ensure_future(pool.run(release.wait)),
+            ]
+            await asyncio.sleep(0)
+            assert pool.in_flight == 2
+            
+            with pytest.raises(PasswordHashPoolSaturated):
+                await pool.run(release.wait)
+            
+            release.set()
+            await asyncio.gather(*running)
+            assert pool.in_flight == 0
+        finally:
+            release.set()
+            pool.shutdown()
+
+class TestPrincipalCache:
+    """Test the authenticated principal cache."""
+    
+    def make_cache(self):
+        from app.core.principal_cache import PrincipalCache
+        from app.redis_client import redis_manager
+        return PrincipalCache(redis_manager, maxsize=10, local_ttl=60)
+    
+    def make_loader(self, calls):
+        async def load():
+            calls.append(1)
+            return make_user(id=1, email="a@example.com", name="A")
+        return load
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_second_lookup_skips_loader(self):
+        """Repeated lookups should be served from the cache."""
+        cache = self.make_cache()
+        calls = []
+        
+        first = await cache.get_or_load(1, self.make_loader(calls))
+        second = await cache.get_or_load(1, self.make_loader(calls))
+        
+        assert first.id == second.id == 1
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert stats["saved_db_calls"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expired_token_is_not_cached(self):
+        """Entries must not outlive the token that loaded them."""
+        cache = self.make_cache()
+        calls = []
+        
+        expired = time.time() - 1
+        await cache.get_or_load(1, self.make_loader(calls), expires_at=expired)
+        await cache.get_or_load(1, self.make_loader(calls), expires_at=expired)
+        assert len(calls) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_invalidate_forces_reload(self):
+        """Invalidation should drop the cached principal."""
+        cache = self.make_cache()
+        calls = []
+        
+        await cache.get_or_load(1, self.make_loader(calls))
+        await cache.invalidate(1)
+        await cache.get_or_load(1, self.make_loader(calls))
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_deactivated_user_is_rejected(self, client, test_db, test_user, auth_headers):
+        """Deactivation through the controller must not be masked by the cache."""
+        from app.controllers.user import user_controller
+        
+        response = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+        assert response.status_code == 200
+        
+        await user_controller.update(test_db, db_obj=test_user, obj_in={"is_active": False})
+        
+        response = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+        assert response.status_code == 401
+
+class TestClaimsCache:
+    """Test memoization of verified JWT claims."""
+    
+    @pytest.fixture(autouse=True)
+    def clear_claims(self):
+        from app.core.security import claims_cache
+        claims_cache.clear()
+        yield
+        claims_cache.clear()
+    
+    @pytest.mark.unit
+    def test_warm_decode_skips_verification(self, monkeypatch):
+        """A repeated token should not be decoded again."""
+        from app.core import security
+        
+        token = security.create_access_token(subject=42)
+        decode = security.jwt.decode
+        calls = []
+        
+        def counting_decode(*args, **kwargs):
+            calls.append(1)
+            return decode(*args, **kwargs)
+        
+        monkeypatch.setattr(security.jwt, "decode", counting_decode)
+        assert security.decode_token(token)["sub"] == "42"
+        assert security.decode_token(token)["sub"] == "42"
+        assert len(calls) == 1
+
+    @pytest.mark.unit
+    def test_invalid_token_is_not_cached(self):
+        """Tokens failing verification must raise every time."""
+        from app.core import security
+        
+        token = security.create_access_token(subject=42) + "tampered"
+        for _ in range(2):
+            with pytest.raises(security.jwt.JWTError):
+                security.decode_token(token)
+        assert len(security.claims_cache) == 0
+
+    @pytest.mark.unit
+    def test_entry_expires_with_token(self):
+        """Claims must not be served past the token exp."""
+        from datetime import timedelta
+        from app.core import security
+        
+        token = security.create_access_token(subject=42, expires_delta=timedelta(seconds=1))
+        security.decode_token(token)
+        time.sleep(2.1)  # jose compares exp against whole seconds
+        with pytest.raises(security.jwt.ExpiredSignatureError):
+            security.decode_token(token)
@@ -41,4 +41,123 @@ async def test_duplicate_email(client: AsyncClient):
     # Try to create second user with same email
     response2 = await client.post("/api/v1/users/", json=user_data)
     assert response2.status_code == 400
-    assert "Email already registered" in response2.json()["detail"]
\ No newline at end of file
+    assert "Email already registered" in response2.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_create_many_partial_failure(test_db, test_user):
+    from app.controllers.user import user_controller
+    from app.schemas.user import UserCreate
+    
+    rows = [
+        UserCreate(name="Bulk A", email="bulk-a@example.com", password="pw"),
+        UserCreate(name="Existing", email="test@example.com", password="pw"),
+        UserCreate(name="Bulk A again", email="bulk-a@example.com", password="pw"),
+        UserCreate(name="Bulk B", email="bulk-b@example.com", password="pw"),
+    ]
+    results = await user_controller.create_many(test_db, objs_in=rows)
+    
+    assert [r.status for r in results] == ["created", "failed", "failed", "created"]
+    assert results[1].detail == "Email already registered"
+    assert results[2].detail == "Duplicate email in batch"
+    assert all(r.id for r in results if r.status == "created")
+    assert await user_controller.authenticate(test_db, email="bulk-b@example.com", password="pw")
+
+@pytest.mark.asyncio
+async def test_create_many_update_existing(test_db, test_user):
+    from app.controllers.user import user_controller
+    from app.schemas.user import UserCreate
+    
+    rows = [UserCreate(name="Renamed", email="test@example.com", password="newpw")]
+    results = await user_controller.create_many(test_db, objs_in=rows, update_existing=True)
+    
+    assert results[0].status == "updated"
+    assert results[0].id == test_user.id
+    assert (await user_controller.get(test_db, id=test_user.id)).name == "Renamed"
+
+@pytest.mark.asyncio
+async def test_create_many_update_keeps_unset_fields(test_db, test_user):
+    from app.controllers.user import user_controller
+    from app.schemas.user import UserBulkRow
+    
+    await user_controller.update(test_db, db_obj=test_user, obj_in={"is_active": False})
+    rows = [UserBulkRow.model_validate({"name": "Reimported", "email": "test@example.com"})]
+    results = await user_controller.create_many(test_db, objs_in=rows, update_existing=True)
+    
+    assert results[0].status == "updated"
+    user = await user_controller.get(test_db, id=test_user.id)
+    assert user.name == "Reimported"
+    assert user.is_active is False  # not reactivated by the is_active default
+    assert user.password == test_user.password
+    
+    missing = await user_controller.create_many(
+        test_db, objs_in=[UserBulkRow(name="New", email="new@example.com")]
+    )
+    assert missing[0].status == "failed"
+    assert missing[0].detail == "Password is required for new users"
+
+@pytest.mark.asyncio
+async def test_get_user_cache_invalidated_on_update(client: AsyncClient, test_db, test_user, auth_headers):
+    from app.controllers.user import user_controller
+    from app.core.response_cache import response_cache
+    
+    first = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+    loads = response_cache.loads
+    second = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+    assert second.json() == first.json()
+    assert response_cache.loads == loads  # served from the cache
+    
+    await user_controller.update(test_db, db_obj=test_user, obj_in={"name": "Renamed"})
+    updated = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+    assert updated.json()["name"] == "Renamed"
+    
+    listed = await client.get("/api/v1/users/", headers=auth_headers)
+    assert [user["name"] for user in listed.json()] == ["Renamed"]
+
+@pytest.mark.asyncio
+async def test_get_user_conditional_get(client: AsyncClient, test_db, test_user, auth_headers):
+    from app.controllers.user import user_controller
+    
+    first = await client.get(f"/api/v1/users/{test_user.id}", headers=auth_headers)
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    
+    unchanged = await client.get(
+        f"/api/v1/users/{test_user.id}", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    
+    listed = await client.get("/api/v1/users/", headers=auth_headers)
+    list_etag = listed.headers["etag"]
+    assert (await client.get("/api/v1/users/", headers={**auth_headers, "If-None-Match": list_etag})).status_code == 304
+    
+    await user_controller.update(test_db, db_obj=test_user, obj_in={"name": "Renamed"})
+    changed = await client.get(
+        f"/api/v1/users/{test_user.id}", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert (await client.get("/api/v1/users/", headers={**auth_headers, "If-None-Match": list_etag})).status_code == 200
+
+@pytest.mark.asyncio
+async def test_update_user_if_match(client: AsyncClient, test_user, auth_headers):
+    url = f"/api/v1/users/{test_user.id}"
+    etag = (await client.get(url, headers=auth_headers)).headers["etag"]
+    
+    updated = await client.patch(url, json={"name": "First"}, headers={**auth_headers, "If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["name"] == "First"
+    assert updated.headers["etag"] != etag
+    
+    # A second writer still holding the old ETag must not overwrite it
+    stale = await client.patch(url, json={"name": "Second"}, headers={**auth_headers, "If-Match": etag})
+    assert stale.status_code == 412
+    assert (await client.get(url, headers=auth_headers)).json()["name"] == "First"
+
+@pytest.mark.asyncio
+async def test_update_user_ignores_nulls(client: AsyncClient, test_user, auth_headers):
+    url = f"/api/v1/users/{test_user.id}"
+    response = await client.patch(url, json={"name": None, "email": None}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["name"] == test_user.name
+    assert response.json()["email"] == test_user.email